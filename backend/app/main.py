@@ -1,11 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from .routes import session, accounts, proxy, orders
 from .routes import onboarding
-from .storage import STORE  # ensures store is initialized (DB or memory)
+from .routes import history
+from .routes import risk
+from .routes import candles
+from .routes import ticker
+from .services import account_mirror, candles as candle_service
+from .storage import STORE  # ensures store is initialized (DB, SQLite or memory)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close the worker's streams instead of dropping them with the process
+    await asyncio.to_thread(account_mirror.reset)
+    candle_service.reset()
 
 
-app = FastAPI(title="Extended Backend Adapter", version="0.1.0")
+app = FastAPI(title="Extended Backend Adapter", version="0.1.0", lifespan=lifespan)
 
 
 app.include_router(session.router, prefix="/session", tags=["session"])
@@ -13,5 +29,9 @@ app.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
 app.include_router(proxy.router, prefix="", tags=["proxy"])
 app.include_router(orders.router, prefix="/orders", tags=["orders"])
 app.include_router(onboarding.router, prefix="/onboarding", tags=["onboarding"])
+app.include_router(history.router, prefix="/history", tags=["history"])
+app.include_router(risk.router, prefix="/risk", tags=["risk"])
+app.include_router(candles.router, prefix="/candles", tags=["candles"])
+app.include_router(ticker.router, prefix="/ticker", tags=["ticker"])
 
 
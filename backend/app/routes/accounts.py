@@ -5,6 +5,7 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
 import json, secrets, traceback
 
+from ..services.trading_context import invalidate_trading_context
 from ..storage import STORE
 from ..config import get_endpoint_config
 import httpx
@@ -41,6 +42,7 @@ def upsert_account(payload: UpsertAccountRequest) -> AccountResponse:
         stark_public_key=payload.stark_public_key,
         vault=payload.vault,
     )
+    invalidate_trading_context(payload.wallet_address, payload.account_index)
     return AccountResponse(
         wallet_address=record.wallet_address,
         account_index=record.account_index,
@@ -177,6 +179,7 @@ def issue_api_key(payload: ApiKeyIssueRequest) -> ApiKeyIssueResponse:
     normalized_wallet = payload.wallet_address.lower()
     print(f"[APIKEY-ISSUE:{rid}] Storing API key. Wallet: {normalized_wallet}, Account: {payload.account_index}")
     STORE.upsert_user(wallet_address=normalized_wallet, account_index=payload.account_index, api_key=api_key)
+    invalidate_trading_context(normalized_wallet, payload.account_index)
     # Verify it was stored
     stored_record = STORE.get_user(wallet_address=normalized_wallet, account_index=payload.account_index)
     if stored_record:
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, Query
+
+from ..services import candles
+
+
+router = APIRouter()
+
+
+@router.get("/{market}")
+def get_candles(
+    market: str,
+    interval: str = Query("PT1M", pattern="^(PT1M|PT5M|PT15M|PT30M|PT1H|PT2H|PT4H|P1D)$"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    if not candles.enabled():
+        raise HTTPException(status_code=404, detail="Candle aggregation is disabled (CANDLES_ENABLED)")
+    try:
+        tracked = candles.tracks(market)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to load the markets: {e}")
+    if not tracked:
+        raise HTTPException(status_code=404, detail=f"Candles of {market} are not aggregated")
+    return {"status": "OK", "data": candles.get_candles(market, interval, limit)}
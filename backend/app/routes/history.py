@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from ..services import history_store
+from ..services.trading_context import get_trading_context
+
+
+router = APIRouter()
+
+# Upper bound of buckets per PnL series request
+_MAX_SERIES_BUCKETS = 1000
+
+
+class SyncRequest(BaseModel):
+    wallet_address: str
+    account_index: int
+    full: bool = False
+
+
+def _get_api_key(wallet_address: str, account_index: int) -> str:
+    record = get_trading_context(wallet_address=wallet_address, account_index=account_index)
+    if not record or not record.api_key:
+        raise HTTPException(status_code=401, detail="API key not found for user")
+    return record.api_key
+
+
+def _ensure_synced(wallet_address: str, account_index: int) -> None:
+    # Queries go upstream on first use and once the last sync is stale, for the rows added since
+    if history_store.needs_sync(wallet_address, account_index):
+        api_key = _get_api_key(wallet_address, account_index)
+        history_store.sync_account(wallet_address, account_index, api_key)
+
+
+@router.post("/sync")
+def sync_history(payload: SyncRequest):
+    api_key = _get_api_key(payload.wallet_address, payload.account_index)
+    return history_store.sync_account(payload.wallet_address, payload.account_index, api_key, full=payload.full)
+
+
+@router.get("/pnl")
+def get_pnl(
+    wallet_address: str,
+    account_index: int,
+    market: Optional[str] = Query(None),
+    start_time: Optional[int] = Query(None),
+    end_time: Optional[int] = Query(None),
+):
+    _ensure_synced(wallet_address, account_index)
+    return history_store.pnl_summary(wallet_address, account_index, market, start_time, end_time)
+
+
+@router.get("/pnl/series")
+def get_pnl_series(
+    wallet_address: str,
+    account_index: int,
+    start_time: int,
+    end_time: int,
+    interval_ms: int = Query(24 * 60 * 60 * 1000),
+    market: Optional[str] = Query(None),
+):
+    if interval_ms <= 0 or end_time < start_time:
+        raise HTTPException(status_code=400, detail="interval_ms must be positive and end_time not before start_time")
+    if (end_time - start_time) // interval_ms >= _MAX_SERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"At most {_MAX_SERIES_BUCKETS} buckets per request")
+    _ensure_synced(wallet_address, account_index)
+    return history_store.pnl_series(wallet_address, account_index, start_time, end_time, interval_ms, market)
+
+
+@router.get("/trades")
+def get_trades(
+    wallet_address: str,
+    account_index: int,
+    market: Optional[str] = Query(None),
+    start_time: Optional[int] = Query(None),
+    end_time: Optional[int] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    _ensure_synced(wallet_address, account_index)
+    return history_store.query("trades", wallet_address, account_index, market, start_time, end_time, limit)
+
+
+@router.get("/positions")
+def get_closed_positions(
+    wallet_address: str,
+    account_index: int,
+    market: Optional[str] = Query(None),
+    start_time: Optional[int] = Query(None),
+    end_time: Optional[int] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    _ensure_synced(wallet_address, account_index)
+    return history_store.query("positions", wallet_address, account_index, market, start_time, end_time, limit)
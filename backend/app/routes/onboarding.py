@@ -7,6 +7,7 @@ import httpx
 import secrets, json
 
 from ..config import get_endpoint_config
+from ..services.trading_context import invalidate_trading_context
 from ..storage import STORE
 
 
@@ -187,6 +188,7 @@ def onboarding_complete(payload: OnboardingCompleteRequest) -> OnboardingComplet
             stark_public_key=pub_hex,
             vault=vault,
         )
+        invalidate_trading_context(normalized_wallet, payload.account_index)
 
         return OnboardingCompleteResponse(stark_private_key=priv_hex, stark_public_key=pub_hex, account_index=payload.account_index, wallet_address=payload.wallet_address)
     except Exception as e:
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
 import httpx
 from pydantic import BaseModel, Field
 
 from ..clients.extended_rest import ExtendedRESTClient
 from ..config import get_endpoint_config
+from ..services import order_journal
+from ..services.idempotency import IDEMPOTENCY_HEADER, UpstreamOutcomeUnknown, UpstreamRejected, run_idempotent
+from ..services.trading_context import get_trading_context, invalidate_trading_context
 from ..storage import STORE
 
 
@@ -19,18 +25,126 @@ class CreateOrderRequest(BaseModel):
 
 
 def _get_api_key(wallet_address: str, account_index: int) -> str:
-    record = STORE.get_user(wallet_address=wallet_address, account_index=account_index)
+    record = get_trading_context(wallet_address=wallet_address, account_index=account_index)
     if not record or not record.api_key:
         raise HTTPException(status_code=401, detail="API key not found for user")
     return record.api_key
 
 
+def _idempotency_scope(path: str, wallet_address: str, account_index: int) -> str:
+    return f"{path}:{wallet_address.lower()}:{account_index}"
+
+
+def _post_order(client: ExtendedRESTClient, api_key: str, order_json: dict, tag: str) -> dict:
+    """
+    Posts an order, turning failures into `HTTPException`s. Upstream rejections (4xx) are definite and raise
+    `UpstreamRejected`; a failure once the request may have been sent (timeout, reset, upstream 5xx) raises
+    `UpstreamOutcomeUnknown`. An idempotent request keeps its key for both, so a retry cannot place the order
+    twice.
+    """
+    try:
+        return client.post_private(api_key, "/user/order", json=order_json)
+    except httpx.HTTPStatusError as e:
+        # Forward Extended API errors instead of bubbling as 500
+        status = e.response.status_code
+        try:
+            detail = e.response.json()
+        except ValueError:
+            detail = {"message": e.response.text or str(e)}
+        print(f"[{tag}] ERROR from Extended: status={status} detail={detail}")
+        if status < 500:
+            raise UpstreamRejected(status_code=status, detail=detail)
+        raise UpstreamOutcomeUnknown(_outcome_unknown_detail(order_json, status, detail)) from e
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # Nothing was sent
+        print(f"[{tag}] Could not reach Extended: {e!r}")
+        raise HTTPException(status_code=502, detail=f"Could not reach Extended API: {e!r}") from e
+    except httpx.TransportError as e:
+        print(f"[{tag}] Outcome unknown, request failed after sending: {e!r}")
+        raise UpstreamOutcomeUnknown(_outcome_unknown_detail(order_json, None, {"message": repr(e)})) from e
+
+
+def _outcome_unknown_detail(order_json: dict, status: Optional[int], upstream: object) -> dict:
+    return {
+        "message": "Order outcome unknown: it may have been placed. Look it up by external_id before placing again.",
+        "external_id": order_json.get("id"),
+        "upstream_status": status,
+        "upstream": upstream,
+    }
+
+
+def _place_signed_order(kind: str, payload: BaseModel, api_key: str, order_json: dict, sign_ms: float) -> dict:
+    """Posts a signed order and journals it; the journal write happens off the request path."""
+    tag = kind.upper()
+    client = ExtendedRESTClient(get_endpoint_config("mainnet" if payload.use_mainnet else "testnet"))
+    journal = dict(
+        kind=kind,
+        wallet_address=payload.wallet_address,
+        account_index=payload.account_index,
+        market=payload.market,
+        request=payload.model_dump(),
+        signed_body=order_json,
+        sign_ms=sign_ms,
+    )
+    started = time.perf_counter()
+    try:
+        order_response = _post_order(client, api_key, order_json, tag)
+    except HTTPException as e:
+        order_journal.record(
+            **journal,
+            status="UNKNOWN" if isinstance(e, UpstreamOutcomeUnknown) else "ERROR",
+            http_status=e.status_code,
+            response=e.detail,
+            upstream_ms=(time.perf_counter() - started) * 1000,
+        )
+        raise
+    except Exception as e:
+        order_journal.record(
+            **journal,
+            status="ERROR",
+            http_status=None,
+            response={"message": str(e)},
+            upstream_ms=(time.perf_counter() - started) * 1000,
+        )
+        raise
+
+    data = order_response.get("data") if isinstance(order_response.get("data"), dict) else {}
+    entry = order_journal.record(
+        **journal,
+        status=data.get("status") or "ACCEPTED",
+        http_status=200,
+        response=order_response,
+        upstream_ms=(time.perf_counter() - started) * 1000,
+    )
+    print(
+        f"[{tag}] {payload.market} {payload.side} -> id={data.get('id')} status={entry['status']} "
+        f"sign={entry['timings_ms']['sign']}ms upstream={entry['timings_ms']['upstream']}ms"
+    )
+    if entry["status"] in ["REJECTED", "CANCELLED"]:
+        print(f"[{tag}] WARNING: Order was {entry['status']}. Reason: {data.get('statusReason', 'Unknown reason')}")
+    return order_response
+
+
 @router.post("")
-def create_order(payload: CreateOrderRequest):
-    api_key = _get_api_key(payload.wallet_address, payload.account_index)
-    client = ExtendedRESTClient(get_endpoint_config())
-    # Expect client-side (or BE) to provide a fully-formed, signed order body.
-    return client.post_private(api_key, "/user/order", json=payload.order)
+def create_order(
+    payload: CreateOrderRequest,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+):
+    def _place():
+        api_key = _get_api_key(payload.wallet_address, payload.account_index)
+        client = ExtendedRESTClient(get_endpoint_config())
+        # Expect client-side (or BE) to provide a fully-formed, signed order body.
+        return _post_order(client, api_key, payload.order, "ORDER")
+
+    scope = _idempotency_scope("/orders", payload.wallet_address, payload.account_index)
+    return run_idempotent(scope, idempotency_key, payload.model_dump(), _place)
+
+
+@router.get("/journal")
+def get_order_journal(wallet_address: str, account_index: int, limit: int = Query(50, ge=1, le=500)):
+    """Recent signed orders of the account sent by this backend, newest first."""
+    _get_api_key(wallet_address, account_index)
+    return {"status": "OK", "data": order_journal.recent(wallet_address, account_index, limit)}
 
 
 class CreateAndPlaceOrderRequest(BaseModel):
@@ -57,7 +171,16 @@ class CreateAndPlaceOrderRequest(BaseModel):
 
 
 @router.post("/create-and-place")
-def create_and_place_order(payload: CreateAndPlaceOrderRequest):
+def create_and_place_order(
+    payload: CreateAndPlaceOrderRequest,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+):
+    # A retried request must not re-sign with a fresh nonce and place a second order.
+    scope = _idempotency_scope("/orders/create-and-place", payload.wallet_address, payload.account_index)
+    return run_idempotent(scope, idempotency_key, payload.model_dump(), lambda: _create_and_place_order(payload))
+
+
+def _create_and_place_order(payload: CreateAndPlaceOrderRequest):
     # Lazy import to avoid failing on Python<3.10 during app import
     try:
         from decimal import Decimal
@@ -70,7 +193,7 @@ def create_and_place_order(payload: CreateAndPlaceOrderRequest):
 
     # Normalize wallet address (database stores lowercase)
     normalized_wallet = payload.wallet_address.lower()
-    record = STORE.get_user(wallet_address=normalized_wallet, account_index=payload.account_index)
+    record = get_trading_context(wallet_address=normalized_wallet, account_index=payload.account_index)
     if not record:
         raise HTTPException(status_code=404, detail="User not found")
     if not record.api_key:
@@ -94,6 +217,7 @@ def create_and_place_order(payload: CreateAndPlaceOrderRequest):
                     account_index=payload.account_index,
                     vault=vault,
                 )
+                invalidate_trading_context(normalized_wallet, payload.account_index)
                 print(f"[ORDER] Fetched and stored vault {vault} from mainnet")
             else:
                 raise HTTPException(
@@ -141,6 +265,7 @@ def create_and_place_order(payload: CreateAndPlaceOrderRequest):
     legs_count = sum(1 for v in [payload.take_profit_trigger_price, payload.stop_loss_trigger_price] if v is not None)
     tp_sl_type = payload.tp_sl_type if legs_count == 2 else None
 
+    sign_started = time.perf_counter()
     order_json = build_signed_limit_order_json(
         api_key=record.api_key,
         stark_private_key_hex=record.stark_private_key,
@@ -165,48 +290,8 @@ def create_and_place_order(payload: CreateAndPlaceOrderRequest):
         stop_loss_price_type=stop_loss_price_type,
     )
 
-    print("[ORDER] Payload prepared for signing:")
-    print(order_json)
-
-    # Place order via private REST
-    client = ExtendedRESTClient(get_endpoint_config("mainnet" if payload.use_mainnet else "testnet"))
-    
-    print(f"[ORDER] ========================================")
-    print(f"[ORDER] Placing order:")
-    print(f"[ORDER]   Market: {payload.market}")
-    print(f"[ORDER]   Side: {payload.side}")
-    print(f"[ORDER]   Qty: {payload.qty}")
-    print(f"[ORDER]   Price: {payload.price}")
-    print(f"[ORDER]   Reduce Only: {payload.reduce_only}")
-    print(f"[ORDER]   Time In Force: {payload.time_in_force}")
-    if payload.tp_sl_type:
-        print(f"[ORDER]   TP/SL Type: {payload.tp_sl_type}")
-    if payload.take_profit_trigger_price is not None:
-        print(f"[ORDER]   Take Profit: trigger={payload.take_profit_trigger_price} ({payload.take_profit_trigger_price_type}), price={payload.take_profit_price} ({payload.take_profit_price_type})")
-    if payload.stop_loss_trigger_price is not None:
-        print(f"[ORDER]   Stop Loss: trigger={payload.stop_loss_trigger_price} ({payload.stop_loss_trigger_price_type}), price={payload.stop_loss_price} ({payload.stop_loss_price_type})")
-    print(f"[ORDER] ========================================")
-    
-    try:
-        order_response = client.post_private(record.api_key, "/user/order", json=order_json)
-    except httpx.HTTPStatusError as e:
-        # Forward Extended API errors instead of bubbling as 500
-        status = e.response.status_code
-        detail = e.response.json() if e.response else {"message": str(e)}
-        print(f"[ORDER] ERROR from Extended: status={status} detail={detail}")
-        raise HTTPException(status_code=status, detail=detail)
-    
-    # Log order response for debugging
-    print(f"[ORDER] Order placed successfully. Response: {order_response}")
-    order_status = order_response.get("data", {}).get("status") if isinstance(order_response.get("data"), dict) else None
-    order_id = order_response.get("data", {}).get("id") if isinstance(order_response.get("data"), dict) else None
-    if order_status:
-        print(f"[ORDER] Order ID: {order_id}, Status: {order_status}")
-        if order_status in ["REJECTED", "CANCELLED"]:
-            status_reason = order_response.get("data", {}).get("statusReason", "Unknown reason")
-            print(f"[ORDER] WARNING: Order was {order_status}. Reason: {status_reason}")
-    
-    return order_response
+    sign_ms = (time.perf_counter() - sign_started) * 1000
+    return _place_signed_order("order", payload, record.api_key, order_json, sign_ms)
 
 
 class AddTpslRequest(BaseModel):
@@ -229,11 +314,19 @@ class AddTpslRequest(BaseModel):
 
 
 @router.post("/add-tpsl")
-def add_tpsl_to_position(payload: AddTpslRequest):
+def add_tpsl_to_position(
+    payload: AddTpslRequest,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+):
     """
     Add TP/SL orders to an existing position.
     This creates reduce-only TPSL-type orders that monitor the position directly.
     """
+    scope = _idempotency_scope("/orders/add-tpsl", payload.wallet_address, payload.account_index)
+    return run_idempotent(scope, idempotency_key, payload.model_dump(), lambda: _add_tpsl_to_position(payload))
+
+
+def _add_tpsl_to_position(payload: AddTpslRequest):
     # Lazy import to avoid failing on Python<3.10 during app import
     try:
         from decimal import Decimal
@@ -246,7 +339,7 @@ def add_tpsl_to_position(payload: AddTpslRequest):
 
     # Normalize wallet address (database stores lowercase)
     normalized_wallet = payload.wallet_address.lower()
-    record = STORE.get_user(wallet_address=normalized_wallet, account_index=payload.account_index)
+    record = get_trading_context(wallet_address=normalized_wallet, account_index=payload.account_index)
     if not record:
         raise HTTPException(status_code=404, detail="User not found")
     if not record.api_key:
@@ -270,6 +363,7 @@ def add_tpsl_to_position(payload: AddTpslRequest):
                     account_index=payload.account_index,
                     vault=vault,
                 )
+                invalidate_trading_context(normalized_wallet, payload.account_index)
                 print(f"[TPSL] Fetched and stored vault {vault} from mainnet")
             else:
                 raise HTTPException(
@@ -321,6 +415,7 @@ def add_tpsl_to_position(payload: AddTpslRequest):
             sl_trigger_type = "LAST"
 
     # Create position-level TPSL order (type="TPSL", tpSlType="POSITION")
+    sign_started = time.perf_counter()
     order_json = build_signed_tpsl_position_order_json(
         api_key=record.api_key,
         stark_private_key_hex=record.stark_private_key,
@@ -339,42 +434,5 @@ def add_tpsl_to_position(payload: AddTpslRequest):
         stop_loss_price_type=stop_loss_price_type,
     )
 
-    print("[TPSL] Payload prepared for signing:")
-    print(order_json)
-
-    # Place order via private REST
-    client = ExtendedRESTClient(get_endpoint_config("mainnet" if payload.use_mainnet else "testnet"))
-
-    print(f"[TPSL] ========================================")
-    print(f"[TPSL] Adding position-level TP/SL:")
-    print(f"[TPSL]   Market: {payload.market}")
-    print(f"[TPSL]   Position Side: {payload.side}")
-    print(f"[TPSL]   Type: TPSL (POSITION-level)")
-    if payload.take_profit_trigger_price is not None:
-        print(f"[TPSL]   Take Profit: trigger={payload.take_profit_trigger_price} ({tp_trigger_type}), exec={take_profit_price} ({take_profit_price_type})")
-    if payload.stop_loss_trigger_price is not None:
-        print(f"[TPSL]   Stop Loss: trigger={payload.stop_loss_trigger_price} ({sl_trigger_type}), exec={stop_loss_price} ({stop_loss_price_type})")
-    print(f"[TPSL] ========================================")
-
-    try:
-        order_response = client.post_private(record.api_key, "/user/order", json=order_json)
-    except httpx.HTTPStatusError as e:
-        # Forward Extended API errors instead of bubbling as 500
-        status = e.response.status_code
-        detail = e.response.json() if e.response else {"message": str(e)}
-        print(f"[TPSL] ERROR from Extended: status={status} detail={detail}")
-        raise HTTPException(status_code=status, detail=detail)
-
-    # Log order response for debugging
-    print(f"[TPSL] TP/SL order placed successfully. Response: {order_response}")
-    order_status = order_response.get("data", {}).get("status") if isinstance(order_response.get("data"), dict) else None
-    order_id = order_response.get("data", {}).get("id") if isinstance(order_response.get("data"), dict) else None
-    if order_status:
-        print(f"[TPSL] Order ID: {order_id}, Status: {order_status}")
-        if order_status in ["REJECTED", "CANCELLED"]:
-            status_reason = order_response.get("data", {}).get("statusReason", "Unknown reason")
-            print(f"[TPSL] WARNING: Order was {order_status}. Reason: {status_reason}")
-
-    return order_response
-
-
+    sign_ms = (time.perf_counter() - sign_started) * 1000
+    return _place_signed_order("tpsl", payload, record.api_key, order_json, sign_ms)
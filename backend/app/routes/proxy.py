@@ -8,7 +8,8 @@ import httpx
 
 from ..clients.extended_rest import ExtendedRESTClient
 from ..config import get_endpoint_config
-from ..storage import STORE
+from ..services import account_mirror
+from ..services.trading_context import get_trading_context
 
 
 router = APIRouter()
@@ -20,7 +21,7 @@ class PrivateQuery(BaseModel):
 
 
 def _get_api_key(wallet_address: str, account_index: int) -> str:
-    record = STORE.get_user(wallet_address=wallet_address, account_index=account_index)
+    record = get_trading_context(wallet_address=wallet_address, account_index=account_index)
     if not record or not record.api_key:
         raise HTTPException(status_code=401, detail="API key not found for user")
     return record.api_key
@@ -29,6 +30,9 @@ def _get_api_key(wallet_address: str, account_index: int) -> str:
 @router.get("/balances")
 def get_balances(wallet_address: str, account_index: int):
     api_key = _get_api_key(wallet_address, account_index)
+    mirrored = account_mirror.balance(api_key)
+    if mirrored is not None:
+        return {"status": "OK", "data": mirrored}
     client = ExtendedRESTClient(get_endpoint_config())
     try:
         return client.get_private(api_key, "/user/balance")
@@ -42,6 +46,9 @@ def get_balances(wallet_address: str, account_index: int):
 @router.get("/positions")
 def get_positions(wallet_address: str, account_index: int):
     api_key = _get_api_key(wallet_address, account_index)
+    mirrored = account_mirror.positions(api_key)
+    if mirrored is not None:
+        return {"status": "OK", "data": mirrored}
     client = ExtendedRESTClient(get_endpoint_config())
     return client.get_private(api_key, "/user/positions")
 
@@ -49,6 +56,10 @@ def get_positions(wallet_address: str, account_index: int):
 @router.get("/orders")
 def get_orders(wallet_address: str, account_index: int, status: Optional[str] = Query(None)):
     api_key = _get_api_key(wallet_address, account_index)
+    # The mirror holds the open orders only, a status filter goes upstream
+    mirrored = account_mirror.open_orders(api_key) if not status else None
+    if mirrored is not None:
+        return {"status": "OK", "data": mirrored}
     client = ExtendedRESTClient(get_endpoint_config())
     params = {"status": status} if status else None
     return client.get_private(api_key, "/user/orders", params=params)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+
+from ..clients.extended_rest import ExtendedRESTClient
+from ..config import get_endpoint_config
+from ..services import account_mirror, risk_engine
+from ..services.risk_engine import AccountKey
+from ..services.trading_context import get_trading_context
+
+
+router = APIRouter()
+
+
+def _get_api_key(wallet_address: str, account_index: int) -> str:
+    record = get_trading_context(wallet_address=wallet_address, account_index=account_index)
+    if not record or not record.api_key:
+        raise HTTPException(status_code=401, detail="API key not found for user")
+    return record.api_key
+
+
+def _account_snapshot(api_key: str) -> tuple[float, List[Dict[str, Any]]]:
+    positions = account_mirror.positions(api_key)
+    balance = account_mirror.balance(api_key)
+    client = ExtendedRESTClient(get_endpoint_config())
+    if positions is None:
+        positions = client.get_private(api_key, "/user/positions").get("data") or []
+    if balance is None:
+        balance = client.get_private(api_key, "/user/balance").get("data") or {}
+    return float(balance.get("balance") or 0), positions
+
+
+def _load_account(wallet_address: str, account_index: int) -> AccountKey:
+    api_key = _get_api_key(wallet_address, account_index)
+    collateral, positions = _account_snapshot(api_key)
+    key = (wallet_address.lower(), account_index)
+    risk_engine.load_account(key, api_key, collateral, positions)
+    return key
+
+
+@router.get("")
+def get_account_risk(wallet_address: str, account_index: int):
+    key = _load_account(wallet_address, account_index)
+    return {"status": "OK", "data": risk_engine.ENGINE.evaluate_account(key).account(key)}
+
+
+@router.get("/alerts")
+def get_risk_alerts(
+    wallet_address: str,
+    account_index: int,
+    max_distance: float = Query(0.1, ge=0),
+    market: Optional[str] = Query(None),
+):
+    # The caller's own positions only
+    key = _load_account(wallet_address, account_index)
+    alerts = risk_engine.ENGINE.evaluate_account(key).at_risk(max_distance)
+    if market:
+        alerts = [a for a in alerts if a["market"] == market]
+    return {"status": "OK", "data": alerts}
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query, Response
+
+from ..services import ticker
+
+
+router = APIRouter()
+
+
+def _json(version: str, body: bytes) -> Response:
+    return Response(content=body, media_type="application/json", headers={"ETag": f'"{version}"'})
+
+
+@router.get("")
+def get_ticker(if_none_match: Optional[str] = Header(None)):
+    """Stats of every market: `fields` names the values of each market's array."""
+    version, body = ticker.snapshot()
+    if if_none_match == f'"{version}"':
+        return Response(status_code=304, headers={"ETag": f'"{version}"'})
+    return _json(version, body)
+
+
+@router.get("/delta")
+def get_ticker_delta(since: str = Query(..., description="`version` of the client's last snapshot or delta")):
+    """Only the fields changed since `since`; the full snapshot (`full: true`) when it cannot be answered."""
+    return _json(*ticker.delta(since))
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+# Stream-fed mirrors of the accounts' open orders, positions and balance (the SDK's `AccountState`), so the
+# proxy endpoints answer without an upstream round trip. Off unless ACCOUNT_MIRROR_ENABLED is set. A mirror is
+# started by the first request of an account and serves once its REST snapshot is loaded; until then (or when
+# it failed to start) the endpoints go upstream as before. Mirrors run on one event loop in a daemon thread of
+# the worker, every worker keeps its own. A mirror not read for ACCOUNT_MIRROR_IDLE_SECONDS is closed, and past
+# ACCOUNT_MIRROR_MAX mirrors the least recently read one is closed to make room.
+_ENABLED = os.getenv("ACCOUNT_MIRROR_ENABLED", "").lower() in ("1", "true", "yes")
+_RECONCILE_SECONDS = float(os.getenv("ACCOUNT_MIRROR_RECONCILE_SECONDS", "60"))
+_IDLE_SECONDS = float(os.getenv("ACCOUNT_MIRROR_IDLE_SECONDS", "900"))
+_MAX_MIRRORS = int(os.getenv("ACCOUNT_MIRROR_MAX", "200"))
+_CLOSE_TIMEOUT_SECONDS = 5.0
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+# api key -> AccountState, least recently read first
+_mirrors: "OrderedDict[str, Any]" = OrderedDict()
+# api key -> time.monotonic() of its last read
+_last_read: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="account-mirror", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(_evict_idle_periodically(), loop)
+        _loop = loop
+    return _loop
+
+
+def _pop(api_key: str) -> Optional[Any]:
+    # Called with the lock held
+    _last_read.pop(api_key, None)
+    return _mirrors.pop(api_key, None)
+
+
+def evict_idle() -> int:
+    """Closes the mirrors not read for ACCOUNT_MIRROR_IDLE_SECONDS; returns how many."""
+    deadline = time.monotonic() - _IDLE_SECONDS
+    with _lock:
+        idle = [_pop(api_key) for api_key in list(_mirrors) if _last_read.get(api_key, deadline) <= deadline]
+    for state in idle:
+        _close(state)
+    if idle:
+        print(f"[ACCOUNT_MIRROR] Closed {len(idle)} idle mirrors")
+    return len(idle)
+
+
+async def _evict_idle_periodically() -> None:
+    while True:
+        await asyncio.sleep(min(_IDLE_SECONDS / 4, 60))
+        evict_idle()
+
+
+def _close(state: Any) -> Optional[Any]:
+    if _loop is None:
+        return None
+    return asyncio.run_coroutine_threadsafe(state.close(), _loop)
+
+
+def _sdk_endpoint_config():
+    # Puts the vendored SDK on sys.path
+    from .order_signing import _get_env_config
+
+    return _get_env_config(use_mainnet=os.getenv("EXTENDED_ENV", "mainnet").lower() == "mainnet")
+
+
+async def _start(api_key: str, state: Any) -> None:
+    try:
+        await state.start()
+    except Exception as e:
+        print(f"[ACCOUNT_MIRROR] Failed to start mirror, serving from upstream: {e}")
+        with _lock:
+            if _mirrors.get(api_key) is state:
+                _pop(api_key)
+        await state.close()
+
+
+def _create_mirror(api_key: str) -> Any:
+    from x10.perpetual.account_state import AccountState  # type: ignore
+
+    state = AccountState(_sdk_endpoint_config(), api_key, reconcile_interval=_RECONCILE_SECONDS)
+    asyncio.run_coroutine_threadsafe(_start(api_key, state), _event_loop())
+    return state
+
+
+def _loaded_mirror(api_key: str) -> Optional[Any]:
+    if not _ENABLED:
+        return None
+    evicted = None
+    with _lock:
+        state = _mirrors.get(api_key)
+        if state is None:
+            if len(_mirrors) >= _MAX_MIRRORS:
+                evicted = _pop(next(iter(_mirrors)))
+            state = _mirrors[api_key] = _create_mirror(api_key)
+        else:
+            _mirrors.move_to_end(api_key)
+        _last_read[api_key] = time.monotonic()
+    if evicted is not None:
+        _close(evicted)
+    return state if state.loaded else None
+
+
+# The readers run on request threads while the mirror loop updates the state; copying a dict's values into a
+# list is atomic in CPython, and the models themselves are replaced rather than mutated.
+def open_orders(api_key: str) -> Optional[List[Dict[str, Any]]]:
+    state = _loaded_mirror(api_key)
+    if state is None:
+        return None
+    return [order.to_api_request_json() for order in state.get_open_orders()]
+
+
+def positions(api_key: str) -> Optional[List[Dict[str, Any]]]:
+    state = _loaded_mirror(api_key)
+    if state is None:
+        return None
+    return [position.to_api_request_json() for position in state.get_positions()]
+
+
+def balance(api_key: str) -> Optional[Dict[str, Any]]:
+    state = _loaded_mirror(api_key)
+    if state is None or state.balance is None:
+        return None
+    return state.balance.to_api_request_json()
+
+
+def reset() -> None:
+    """Stops every mirror and waits for their streams to close (tests, app shutdown)."""
+    with _lock:
+        mirrors = list(_mirrors.values())
+        _mirrors.clear()
+        _last_read.clear()
+    for future in [_close(state) for state in mirrors]:
+        if future is None:
+            continue
+        try:
+            future.result(_CLOSE_TIMEOUT_SECONDS)
+        except Exception as e:
+            print(f"[ACCOUNT_MIRROR] Failed to close a mirror: {e}")
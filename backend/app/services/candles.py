@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+
+import httpx
+
+
+# Trade candles of every interval served from one public trades stream per worker (the SDK's
+# `CandleAggregator`), instead of a candles stream or an upstream request per market and interval. Off unless
+# CANDLES_ENABLED is set; CANDLES_MARKETS (comma separated) limits the aggregated markets, all the exchange's
+# markets by default (other names get a 404 before any series is created for them). The aggregator starts with
+# the first request on an event loop in a daemon thread; the history of a series is seeded from the upstream
+# candles history once it was fetched successfully, later candles are built locally.
+_ENABLED = os.getenv("CANDLES_ENABLED", "").lower() in ("1", "true", "yes")
+_MARKETS = [m.strip() for m in os.getenv("CANDLES_MARKETS", "").split(",") if m.strip()] or None
+_HISTORY = int(os.getenv("CANDLES_HISTORY", "500"))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_aggregator: Any = None
+_seeded: Set[Tuple[str, str]] = set()
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="candles", daemon=True).start()
+        _loop = loop
+    return _loop
+
+
+def _sdk_endpoint_config():
+    # Puts the vendored SDK on sys.path
+    from .account_mirror import _sdk_endpoint_config
+
+    return _sdk_endpoint_config()
+
+
+def tracks(market: str) -> bool:
+    """Whether `market` is aggregated: one of CANDLES_MARKETS, or of the exchange's markets when unset."""
+    if _MARKETS is not None:
+        return market in _MARKETS
+    from . import ticker
+
+    return market in ticker.market_names()
+
+
+def _get_aggregator() -> Any:
+    global _aggregator
+    with _lock:
+        if _aggregator is None:
+            from x10.perpetual.candle_aggregator import CandleAggregator  # type: ignore
+
+            _aggregator = CandleAggregator(_sdk_endpoint_config(), markets=_MARKETS, history=_HISTORY)
+            asyncio.run_coroutine_threadsafe(_aggregator.start(), _event_loop())
+            print(f"[CANDLES] Aggregating trade candles of {_MARKETS or 'all markets'}")
+        return _aggregator
+
+
+def _fetch_upstream_history(market: str, interval: str) -> list:
+    url = f"{_sdk_endpoint_config().api_base_url}/info/candles/{market}/trades"
+    with httpx.Client(timeout=15.0) as client:
+        res = client.get(url, params={"interval": interval, "limit": _HISTORY})
+        res.raise_for_status()
+        return res.json().get("data") or []
+
+
+def _seed(aggregator: Any, market: str, interval: str) -> None:
+    key = (market, interval)
+    with _lock:
+        if key in _seeded:
+            return
+        _seeded.add(key)
+    try:
+        from x10.perpetual.candles import CandleModel  # type: ignore
+
+        candles = [CandleModel.model_validate(c) for c in _fetch_upstream_history(market, interval)]
+    except Exception as e:
+        print(f"[CANDLES] Failed to seed {market} {interval} history from upstream: {e}")
+        # Retried by the next request
+        with _lock:
+            _seeded.discard(key)
+        return
+    # Applied on the aggregator's loop, where the trades are applied
+    asyncio.run_coroutine_threadsafe(_apply_seed(aggregator, market, interval, candles), _event_loop()).result(5)
+
+
+async def _apply_seed(aggregator: Any, market: str, interval: str, candles: list) -> None:
+    aggregator.seed_history(market, interval, candles)
+
+
+def _candle_json(candle: Any) -> Dict[str, Any]:
+    return {
+        "timestamp": candle.timestamp,
+        "open": str(candle.open),
+        "high": str(candle.high),
+        "low": str(candle.low),
+        "close": str(candle.close),
+        "volume": str(candle.volume) if candle.volume is not None else None,
+    }
+
+
+def get_candles(market: str, interval: str, limit: int) -> Dict[str, Any]:
+    """The current (still open) candle and up to `limit` closed ones, oldest first."""
+    aggregator = _get_aggregator()
+    _seed(aggregator, market, interval)
+    current = aggregator.get_current(market, interval)
+    return {
+        "market": market,
+        "interval": interval,
+        "current": _candle_json(current) if current is not None else None,
+        "history": [_candle_json(c) for c in aggregator.get_history(market, interval, limit)],
+    }
+
+
+def reset() -> None:
+    """Stops the aggregator (tests, shutdown)."""
+    global _aggregator
+    with _lock:
+        aggregator, _aggregator = _aggregator, None
+        _seeded.clear()
+    if aggregator is not None and _loop is not None:
+        asyncio.run_coroutine_threadsafe(aggregator.close(), _loop)
@@ -0,0 +1,451 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from ..clients.extended_rest import ExtendedRESTClient
+from ..config import get_endpoint_config
+
+
+# Local copy of every account's trades and closed positions, so PnL and history screens are answered without
+# going upstream. Rows are kept per (account, market) in columns sorted by time: a time window is two bisects
+# and the aggregates are sums over column slices. Ids, times and codes are int arrays; amounts stay `Decimal`
+# (returned as strings), as everywhere else in the backend.
+# The store lives in the worker's memory, for the HISTORY_MAX_ACCOUNTS most recently used accounts; every worker
+# syncs its own copy on first use, and again on a read once its last sync is HISTORY_REFRESH_SECONDS old. A sync
+# fetches its pages without holding the account's lock, so reads are only held up while a page is stored.
+_PAGE_LIMIT = int(os.getenv("HISTORY_SYNC_PAGE_LIMIT", "100"))
+# Upper bound of upstream pages per sync; a longer backfill resumes from its cursor on the next sync.
+_MAX_PAGES_PER_SYNC = int(os.getenv("HISTORY_SYNC_MAX_PAGES", "50"))
+_REFRESH_SECONDS = float(os.getenv("HISTORY_REFRESH_SECONDS", "30"))
+_MAX_ACCOUNTS = int(os.getenv("HISTORY_MAX_ACCOUNTS", "500"))
+
+TRADES_PATH = "/user/trades"
+POSITIONS_HISTORY_PATH = "/user/positions/history"
+
+AccountKey = Tuple[str, int]
+
+_SIDES = {"BUY": 1, "LONG": 1, "SELL": -1, "SHORT": -1}
+_SIDE_NAMES = {"trades": {1: "BUY", -1: "SELL"}, "positions": {1: "LONG", -1: "SHORT"}}
+_TRADE_TYPES = ("TRADE", "LIQUIDATION", "DELEVERAGE")
+_EXIT_TYPES = ("", "TRADE", "LIQUIDATION", "ADL")
+
+
+_ZERO = Decimal(0)
+
+# An int array, or (typecode "D") a list of Decimal
+Column = Union[array, List[Decimal]]
+
+
+def _number(value: Any) -> Decimal:
+    return Decimal(str(value)) if value is not None else _ZERO
+
+
+def _column(typecode: str, values: Iterable[Any] = ()) -> Column:
+    return list(values) if typecode == "D" else array(typecode, values)
+
+
+def _code(names: Tuple[str, ...], value: Optional[str]) -> int:
+    return names.index(value) if value in names else 0
+
+
+class _Columns:
+    """
+    Rows of one (account, market) in columns, ordered by `time`.
+    """
+
+    # name -> array typecode, "D" for Decimal amounts; `time` is the sort key, `id` identifies the row upstream
+    SCHEMA: Dict[str, str] = {}
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, Column] = {name: _column(typecode) for name, typecode in self.SCHEMA.items()}
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    def insert(self, rows: List[Dict[str, Any]]) -> None:
+        rows = sorted(rows, key=lambda row: row["time"])
+        times = self.columns["time"]
+        if not times or rows[0]["time"] >= times[-1]:
+            for name, values in self.columns.items():
+                values.extend(row[name] for row in rows)
+            return
+        # Out of order (backfill of older pages): merge and rebuild the columns once
+        merged = sorted(
+            list(zip(*self.columns.values())) + [tuple(row[name] for name in self.columns) for row in rows],
+            key=lambda values: values[0],
+        )
+        for index, (name, typecode) in enumerate(self.SCHEMA.items()):
+            self.columns[name] = _column(typecode, (values[index] for values in merged))
+
+    def window(self, start_time: Optional[int], end_time: Optional[int]) -> Tuple[int, int]:
+        times = self.columns["time"]
+        low = bisect_left(times, start_time) if start_time is not None else 0
+        high = bisect_right(times, end_time) if end_time is not None else len(times)
+        return low, high
+
+    def total(self, name: str, low: int, high: int) -> Decimal:
+        return sum(self.columns[name][low:high], _ZERO)
+
+
+class _TradeColumns(_Columns):
+    SCHEMA = {
+        "time": "q",
+        "id": "q",
+        "order_id": "q",
+        "side": "b",
+        "trade_type": "b",
+        "is_taker": "b",
+        "price": "D",
+        "qty": "D",
+        "value": "D",
+        "fee": "D",
+    }
+
+    @staticmethod
+    def row(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return {
+            "time": int(item["createdTime"]),
+            "id": int(item["id"]),
+            "order_id": int(item.get("orderId") or 0),
+            "side": _SIDES.get(item.get("side"), 0),
+            "trade_type": _code(_TRADE_TYPES, item.get("tradeType")),
+            "is_taker": 1 if item.get("isTaker") else 0,
+            "price": _number(item.get("price")),
+            "qty": _number(item.get("qty")),
+            "value": _number(item.get("value")),
+            "fee": _number(item.get("fee")),
+        }
+
+
+class _PositionColumns(_Columns):
+    # Closed positions, ordered by their closing time
+    SCHEMA = {
+        "time": "q",
+        "id": "q",
+        "created_time": "q",
+        "side": "b",
+        "exit_type": "b",
+        "size": "D",
+        "max_position_size": "D",
+        "leverage": "D",
+        "open_price": "D",
+        "exit_price": "D",
+        "realised_pnl": "D",
+        "trade_pnl": "D",
+        "funding_fees": "D",
+        "open_fees": "D",
+        "close_fees": "D",
+    }
+
+    @staticmethod
+    def row(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if item.get("closedTime") is None:
+            # Still open: its PnL is not realised yet, it is stored once a sync sees it closed
+            return None
+        breakdown = item.get("realisedPnlBreakdown") or {}
+        return {
+            "time": int(item["closedTime"]),
+            "id": int(item["id"]),
+            "created_time": int(item.get("createdTime") or 0),
+            "side": _SIDES.get(item.get("side"), 0),
+            "exit_type": _code(_EXIT_TYPES, item.get("exitType")),
+            "size": _number(item.get("size")),
+            "max_position_size": _number(item.get("maxPositionSize")),
+            "leverage": _number(item.get("leverage")),
+            "open_price": _number(item.get("openPrice")),
+            "exit_price": _number(item.get("exitPrice")),
+            "realised_pnl": _number(item.get("realisedPnl")),
+            "trade_pnl": _number(breakdown.get("tradePnl")),
+            "funding_fees": _number(breakdown.get("fundingFees")),
+            "open_fees": _number(breakdown.get("openFees")),
+            "close_fees": _number(breakdown.get("closeFees")),
+        }
+
+
+_KINDS: Dict[str, Tuple[str, type]] = {
+    "trades": (TRADES_PATH, _TradeColumns),
+    "positions": (POSITIONS_HISTORY_PATH, _PositionColumns),
+}
+
+
+@dataclass
+class _SyncState:
+    ids: set = field(default_factory=set)
+    # Positions seen still open: an incremental sync walks down to the oldest of them to pick up its closing
+    open_ids: set = field(default_factory=set)
+    # Cursor of the next older page while a backfill is incomplete, None once it reached the oldest page
+    backfill_cursor: Optional[int] = None
+    backfilled: bool = False
+    synced_at: Optional[float] = None
+
+
+@dataclass
+class _AccountHistory:
+    # Held while rows are stored or read
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # One sync of the account at a time, held across its upstream requests
+    sync_lock: threading.Lock = field(default_factory=threading.Lock)
+    markets: Dict[str, Dict[str, _Columns]] = field(default_factory=dict)
+    sync: Dict[str, _SyncState] = field(default_factory=lambda: {kind: _SyncState() for kind in _KINDS})
+
+    def partitions(self, kind: str, market: Optional[str]) -> Iterable[Tuple[str, _Columns]]:
+        for name, kinds in self.markets.items():
+            if market is None or name == market:
+                yield name, kinds[kind]
+
+
+# Least recently used first
+_accounts: "OrderedDict[AccountKey, _AccountHistory]" = OrderedDict()
+_accounts_lock = threading.Lock()
+
+
+def _account_key(wallet_address: str, account_index: int) -> AccountKey:
+    return wallet_address.lower(), account_index
+
+
+def _history(wallet_address: str, account_index: int) -> _AccountHistory:
+    key = _account_key(wallet_address, account_index)
+    with _accounts_lock:
+        history = _accounts.get(key)
+        if history is None:
+            history = _accounts[key] = _AccountHistory()
+            while len(_accounts) > _MAX_ACCOUNTS:
+                _accounts.popitem(last=False)
+        else:
+            _accounts.move_to_end(key)
+        return history
+
+
+def _store_items(history: _AccountHistory, kind: str, items: List[Dict[str, Any]]) -> Tuple[int, bool]:
+    """
+    Stores the items not seen before; returns how many were new and whether the page had known items.
+    """
+    _, columns_class = _KINDS[kind]
+    state = history.sync[kind]
+    new_rows: Dict[str, List[Dict[str, Any]]] = {}
+    seen_known = False
+    for item in items:
+        if int(item["id"]) in state.ids:
+            seen_known = True
+            continue
+        row = columns_class.row(item)
+        if row is None:
+            state.open_ids.add(int(item["id"]))
+            continue
+        state.open_ids.discard(row["id"])
+        state.ids.add(row["id"])
+        new_rows.setdefault(item["market"], []).append(row)
+
+    for market, rows in new_rows.items():
+        kinds = history.markets.get(market)
+        if kinds is None:
+            kinds = history.markets[market] = {name: cls() for name, (_, cls) in _KINDS.items()}
+        kinds[kind].insert(rows)
+    return sum(len(rows) for rows in new_rows.values()), seen_known
+
+
+def _sync_kind(
+    history: _AccountHistory, kind: str, fetch: Callable[[str, Dict[str, Any]], Dict[str, Any]], full: bool
+) -> Dict[str, Any]:
+    path, _ = _KINDS[kind]
+    state = history.sync[kind]
+    added = pages = 0
+
+    def walk(cursor: Optional[int], stop_at_known: bool) -> Tuple[Optional[int], bool]:
+        # Returns the cursor to resume from and whether the walk reached the end of the history
+        nonlocal added, pages
+        while pages < _MAX_PAGES_PER_SYNC:
+            params: Dict[str, Any] = {"limit": _PAGE_LIMIT}
+            if cursor is not None:
+                params["cursor"] = cursor
+            response = fetch(path, params)
+            pages += 1
+            items = response.get("data") or []
+            with history.lock:
+                new, seen_known = _store_items(history, kind, items)
+            added += new
+            next_cursor = (response.get("pagination") or {}).get("cursor")
+            if not items or next_cursor is None or len(items) < _PAGE_LIMIT:
+                return None, True
+            # Past the known rows, and past every position open at the last sync, which may have closed since
+            if stop_at_known and seen_known and (
+                not state.open_ids or min(int(item["id"]) for item in items) <= min(state.open_ids)
+            ):
+                return None, False
+            cursor = next_cursor
+        return cursor, False
+
+    # Newest pages first, until reaching rows stored by an earlier sync (and the oldest open position)
+    resume_cursor, reached_end = walk(None, stop_at_known=not full)
+    if not reached_end and resume_cursor is None and state.backfill_cursor is not None:
+        # Caught up with the newest rows, carry on with the older pages of an interrupted backfill
+        resume_cursor, reached_end = walk(state.backfill_cursor, stop_at_known=False)
+    with history.lock:
+        if reached_end:
+            state.backfill_cursor, state.backfilled = None, True
+        elif resume_cursor is not None:
+            # Out of pages for this sync: the next one walks on from here down to the oldest page, which also
+            # covers an older interrupted backfill
+            state.backfill_cursor, state.backfilled = resume_cursor, False
+        state.synced_at = time.time()
+    return {"added": added, "pages": pages, "complete": state.backfilled}
+
+
+def sync_account(wallet_address: str, account_index: int, api_key: str, full: bool = False) -> Dict[str, Any]:
+    """
+    Pulls the trades and positions history added upstream since the last sync (all of it on the first one),
+    including positions open at the last sync that have closed since. `full` walks the whole history again.
+    """
+    client = ExtendedRESTClient(get_endpoint_config())
+    history = _history(wallet_address, account_index)
+
+    def fetch(path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        return client.get_private(api_key, path, params=params)
+
+    # The pages are fetched outside `history.lock`; each one is stored under it
+    with history.sync_lock:
+        result = {kind: _sync_kind(history, kind, fetch, full) for kind in _KINDS}
+    print(
+        f"[HISTORY] Synced {wallet_address}:{account_index}: "
+        + ", ".join(f"{kind} +{stats['added']} in {stats['pages']} pages" for kind, stats in result.items())
+    )
+    return result
+
+
+def needs_sync(wallet_address: str, account_index: int) -> bool:
+    """Whether the account was never synced, or its last sync is older than HISTORY_REFRESH_SECONDS."""
+    history = _accounts.get(_account_key(wallet_address, account_index))
+    if history is None:
+        return True
+    now = time.time()
+    return any(state.synced_at is None or now - state.synced_at >= _REFRESH_SECONDS for state in history.sync.values())
+
+
+def _json(value: Any) -> Any:
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def pnl_summary(
+    wallet_address: str,
+    account_index: int,
+    market: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Realised PnL with its breakdown (positions closed in the window) and trading fees and volume (trades
+    executed in the window), in total and per market. Times are epoch milliseconds, both ends inclusive.
+    """
+    history = _history(wallet_address, account_index)
+    position_fields = ("realised_pnl", "trade_pnl", "funding_fees", "open_fees", "close_fees")
+    by_market: Dict[str, Dict[str, Any]] = {}
+    with history.lock:
+        for name, positions in history.partitions("positions", market):
+            low, high = positions.window(start_time, end_time)
+            summary = by_market.setdefault(name, {})
+            summary["positions_closed"] = high - low
+            for column in position_fields:
+                summary[column] = positions.total(column, low, high)
+        for name, trades in history.partitions("trades", market):
+            low, high = trades.window(start_time, end_time)
+            summary = by_market.setdefault(name, {})
+            summary["trades"] = high - low
+            summary["trading_fees"] = trades.total("fee", low, high)
+            summary["volume"] = trades.total("value", low, high)
+
+    by_market = {
+        name: summary for name, summary in by_market.items() if summary["positions_closed"] or summary["trades"]
+    }
+    totals: Dict[str, Any] = {"positions_closed": 0, **{column: _ZERO for column in position_fields}}
+    totals.update(trades=0, trading_fees=_ZERO, volume=_ZERO)
+    for summary in by_market.values():
+        for column, value in summary.items():
+            totals[column] += value
+
+    def encoded(summary: Dict[str, Any]) -> Dict[str, Any]:
+        return {column: _json(value) for column, value in summary.items()}
+
+    return {
+        "start_time": start_time,
+        "end_time": end_time,
+        "total": encoded(totals),
+        "markets": {name: encoded(summary) for name, summary in sorted(by_market.items())},
+    }
+
+
+def pnl_series(
+    wallet_address: str,
+    account_index: int,
+    start_time: int,
+    end_time: int,
+    interval_ms: int,
+    market: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Realised PnL breakdown per `interval_ms` bucket from `start_time`, e.g. for a daily PnL chart.
+    """
+    history = _history(wallet_address, account_index)
+    columns = ("realised_pnl", "trade_pnl", "funding_fees", "open_fees", "close_fees")
+    bounds = list(range(start_time, end_time + 1, interval_ms))
+    buckets = [dict({column: _ZERO for column in columns}, start_time=bound, positions_closed=0) for bound in bounds]
+    with history.lock:
+        for _, positions in history.partitions("positions", market):
+            for bucket, bound in zip(buckets, bounds):
+                low, high = positions.window(bound, min(bound + interval_ms - 1, end_time))
+                if low >= high:
+                    continue
+                bucket["positions_closed"] += high - low
+                for column in columns:
+                    bucket[column] += positions.total(column, low, high)
+    return [{name: _json(value) for name, value in bucket.items()} for bucket in buckets]
+
+
+def _rows(kind: str, columns: _Columns, low: int, high: int, market: str) -> List[Dict[str, Any]]:
+    names = list(columns.columns)
+    rows = []
+    for values in zip(*(column[low:high] for column in columns.columns.values())):
+        row: Dict[str, Any] = dict(zip(names, map(_json, values)), market=market)
+        row["side"] = _SIDE_NAMES[kind].get(row["side"])
+        if kind == "trades":
+            row["trade_type"] = _TRADE_TYPES[row["trade_type"]]
+            row["is_taker"] = bool(row["is_taker"])
+        else:
+            row["exit_type"] = _EXIT_TYPES[row["exit_type"]] or None
+        rows.append(row)
+    return rows
+
+
+def query(
+    kind: str,
+    wallet_address: str,
+    account_index: int,
+    market: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Stored trades or closed positions in the window, newest first (positions by closing time).
+    """
+    history = _history(wallet_address, account_index)
+    rows: List[Dict[str, Any]] = []
+    with history.lock:
+        for name, columns in history.partitions(kind, market):
+            low, high = columns.window(start_time, end_time)
+            # Only the newest `limit` of every market can make it into the result
+            rows.extend(_rows(kind, columns, max(low, high - limit), high, name))
+    rows.sort(key=lambda row: (row["time"], row["id"]), reverse=True)
+    return rows[:limit]
+
+
+def reset() -> None:
+    with _accounts_lock:
+        _accounts.clear()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..storage import STORE
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+# Completed results are replayed for this long; retries after that are treated as new requests.
+_RESULT_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+# How long an in-flight claim is honoured before another request may take over (e.g. the worker died). The
+# request holding it renews it every third of that while its handler runs, however long upstream takes.
+_IN_FLIGHT_LEASE_SECONDS = 60.0
+_POLL_INTERVAL_SECONDS = 0.05
+
+# Same-worker retries wake up as soon as the original finishes; other workers poll the store.
+_local_in_flight: Dict[str, threading.Event] = {}
+_local_lock = threading.Lock()
+
+
+class UpstreamRejected(HTTPException):
+    """
+    Upstream answered the request with an error (4xx). The outcome is definite, so the key keeps this answer and
+    retries replay it.
+    """
+
+
+class UpstreamOutcomeUnknown(HTTPException):
+    """
+    The request may have reached upstream, but its result is unknown (a timeout or reset after sending, an
+    upstream server error). The key keeps this answer instead of being released, so a retry cannot repeat the
+    side effect; the client reconciles, e.g. by looking the order up by its external id.
+    """
+
+    def __init__(self, detail: Any) -> None:
+        super().__init__(status_code=502, detail=detail)
+
+
+def _fingerprint(request_body: Any) -> str:
+    return hashlib.sha256(json.dumps(request_body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(status_code: int, response: Any) -> Any:
+    if status_code >= 400:
+        raise HTTPException(status_code=status_code, detail=response)
+    return response
+
+
+def _wait_for_result(key: str) -> Any:
+    deadline = time.time() + _IN_FLIGHT_LEASE_SECONDS
+    event = _local_in_flight.get(key)
+    while time.time() < deadline:
+        record = STORE.get_idempotency_record(key)
+        if record is None:
+            raise HTTPException(status_code=409, detail="Original request with this Idempotency-Key failed, retry it")
+        if record.status_code is not None:
+            print(f"[IDEMPOTENCY] Replaying stored response for {key}")
+            return _replay(record.status_code, record.response)
+        if event is not None:
+            event.wait(_POLL_INTERVAL_SECONDS)
+        else:
+            time.sleep(_POLL_INTERVAL_SECONDS)
+    raise HTTPException(status_code=409, detail="Request with this Idempotency-Key is still in progress")
+
+
+def run_idempotent(
+    scope: str,
+    idempotency_key: Optional[str],
+    request_body: Any,
+    handler: Callable[[], Any],
+) -> Any:
+    """
+    Runs `handler` at most once per (scope, Idempotency-Key).
+
+    A retry with the same key gets the stored response of the first request (or waits for it while
+    it is still in flight). Reusing a key with a different body is rejected with 422. Only outcomes of the
+    upstream call are stored: the handler's result, `UpstreamRejected` and `UpstreamOutcomeUnknown`. Any other
+    error (e.g. an unknown user or market) must happen before anything was sent upstream and releases the key,
+    so the client can fix the cause and retry with it.
+    """
+    if not idempotency_key:
+        return handler()
+
+    key = f"{scope}:{idempotency_key}"
+    fingerprint = _fingerprint(request_body)
+    existing = STORE.claim_idempotency_key(key, fingerprint, _IN_FLIGHT_LEASE_SECONDS)
+    if existing is not None:
+        if existing.fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        if existing.status_code is not None:
+            print(f"[IDEMPOTENCY] Replaying stored response for {key}")
+            return _replay(existing.status_code, existing.response)
+        return _wait_for_result(key)
+
+    event = threading.Event()
+    with _local_lock:
+        _local_in_flight[key] = event
+    threading.Thread(target=_renew_lease, args=(key, event), name="idempotency-lease", daemon=True).start()
+    try:
+        try:
+            result = handler()
+        except (UpstreamRejected, UpstreamOutcomeUnknown) as e:
+            STORE.complete_idempotency_key(key, e.status_code, e.detail, _RESULT_TTL_SECONDS)
+            raise
+        except BaseException:
+            STORE.release_idempotency_key(key)
+            raise
+        STORE.complete_idempotency_key(key, 200, result, _RESULT_TTL_SECONDS)
+        return result
+    finally:
+        with _local_lock:
+            _local_in_flight.pop(key, None)
+        event.set()
+
+
+def _renew_lease(key: str, done: threading.Event) -> None:
+    interval = _IN_FLIGHT_LEASE_SECONDS / 3
+    while not done.wait(interval):
+        try:
+            STORE.renew_idempotency_key(key, _IN_FLIGHT_LEASE_SECONDS)
+        except Exception as e:
+            print(f"[IDEMPOTENCY] Failed to renew the lease of {key}: {e}")
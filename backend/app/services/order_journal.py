@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..storage import STORE
+
+
+# Append-only record of every signed order the backend sends upstream: the request, a hash of the signed body,
+# the upstream response and status, and the signing/round-trip timings. The order path only enqueues (never
+# blocks, a full queue drops the entry and counts it); a daemon thread flushes batches to the store, or to
+# segmented JSON-lines files in ORDER_JOURNAL_DIR when set. Recent entries of each account are also kept in
+# memory, so the per-account query sees entries that are not flushed yet. The segments are not indexed: with
+# the file sink the per-account query only sees this worker's in-memory entries.
+_DIR = os.getenv("ORDER_JOURNAL_DIR", "")
+_SEGMENT_BYTES = int(os.getenv("ORDER_JOURNAL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+_SEGMENTS_KEPT = int(os.getenv("ORDER_JOURNAL_SEGMENTS", "16"))
+_FLUSH_SECONDS = float(os.getenv("ORDER_JOURNAL_FLUSH_SECONDS", "0.5"))
+_QUEUE_SIZE = 10_000
+_BATCH_SIZE = 500
+_RECENT_PER_ACCOUNT = 200
+
+AccountKey = Tuple[str, int]
+
+_queue: "queue.Queue[Any]" = queue.Queue(maxsize=_QUEUE_SIZE)
+_recent: Dict[AccountKey, Deque[Dict[str, Any]]] = {}
+_lock = threading.Lock()
+_writer: Optional[threading.Thread] = None
+_stats = {"recorded": 0, "dropped": 0, "flushed": 0, "failed": 0}
+
+
+def body_hash(body: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+
+class _SegmentedFile:
+    """
+    JSON-lines segments `orders-<start ms>-<pid>-<seq>.jsonl`, a new one past `segment_bytes`. Every worker
+    writes its own segments and keeps only its newest `segments_kept`; it never deletes the segments of a
+    running worker. Of the segments left by workers that exited, the newest `segments_kept` are kept.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, segments_kept: int) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segments_kept = segments_kept
+        self._prefix = f"orders-{int(time.time() * 1000)}-{os.getpid()}"
+        self._seq = 0
+        self._file = None
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        self._file = open(os.path.join(self.directory, f"{self._prefix}-{self._seq:06d}.jsonl"), "a")
+        own: List[str] = []
+        orphaned: List[str] = []
+        for name in os.listdir(self.directory):
+            if name.startswith(self._prefix + "-"):
+                own.append(name)
+            elif name.startswith("orders-") and not _pid_alive(_segment_pid(name)):
+                orphaned.append(name)
+        # The names sort by worker start time, then segment number
+        for segments in (sorted(own), sorted(orphaned)):
+            for name in segments[: max(len(segments) - self.segments_kept, 0)]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    # Another worker trimmed the same orphaned segment
+                    pass
+
+    def append_order_journal(self, entries: List[Dict[str, Any]]) -> None:
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._rotate()
+        self._file.write("".join(json.dumps(entry, default=str) + "\n" for entry in entries))
+        self._file.flush()
+
+
+def _segment_pid(name: str) -> Optional[int]:
+    parts = name.split("-")
+    return int(parts[2]) if len(parts) == 4 and parts[2].isdigit() else None
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        # Not a segment name of ours: leave it alone
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_sink: Any = _SegmentedFile(_DIR, _SEGMENT_BYTES, _SEGMENTS_KEPT) if _DIR else STORE
+
+
+def _write(batch: List[Dict[str, Any]]) -> None:
+    try:
+        _sink.append_order_journal(batch)
+        _stats["flushed"] += len(batch)
+    except Exception as e:
+        _stats["failed"] += len(batch)
+        print(f"[ORDER_JOURNAL] Failed to write {len(batch)} entries: {e}")
+
+
+def _run() -> None:
+    while True:
+        item = _queue.get()
+        batch: List[Dict[str, Any]] = []
+        waiters: List[threading.Event] = []
+        deadline = time.monotonic() + _FLUSH_SECONDS
+        while True:
+            if isinstance(item, threading.Event):
+                # flush(): write what is queued now
+                waiters.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= _BATCH_SIZE:
+                break
+            try:
+                item = _queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+        if batch:
+            _write(batch)
+        for waiter in waiters:
+            waiter.set()
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer is None:
+        with _lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run, name="order-journal", daemon=True)
+                _writer.start()
+
+
+def record(
+    *,
+    kind: str,
+    wallet_address: str,
+    account_index: int,
+    market: str,
+    request: Dict[str, Any],
+    signed_body: Dict[str, Any],
+    status: str,
+    http_status: Optional[int],
+    response: Any,
+    sign_ms: float,
+    upstream_ms: float,
+) -> Dict[str, Any]:
+    entry = {
+        "id": uuid.uuid4().hex,
+        "ts": int(time.time() * 1000),
+        "kind": kind,
+        "wallet_address": wallet_address.lower(),
+        "account_index": account_index,
+        "market": market,
+        "external_id": signed_body.get("id"),
+        "request": request,
+        "body_hash": body_hash(signed_body),
+        "status": status,
+        "http_status": http_status,
+        "response": response,
+        "timings_ms": {"sign": round(sign_ms, 3), "upstream": round(upstream_ms, 3)},
+    }
+    key = (entry["wallet_address"], account_index)
+    with _lock:
+        recent = _recent.get(key)
+        if recent is None:
+            recent = _recent[key] = deque(maxlen=_RECENT_PER_ACCOUNT)
+        recent.append(entry)
+        _stats["recorded"] += 1
+    _ensure_writer()
+    try:
+        _queue.put_nowait(entry)
+    except queue.Full:
+        _stats["dropped"] += 1
+    return entry
+
+
+def recent(wallet_address: str, account_index: int, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Newest first: this worker's recent entries merged with the store's (entries of the other workers). With the
+    file sink (ORDER_JOURNAL_DIR) only this worker's recent in-memory entries are returned.
+    """
+    key = (wallet_address.lower(), account_index)
+    with _lock:
+        entries = {entry["id"]: entry for entry in _recent.get(key, ())}
+    if _sink is STORE:
+        for entry in STORE.recent_order_journal(key[0], account_index, limit):
+            entries.setdefault(entry["id"], entry)
+    return sorted(entries.values(), key=lambda entry: entry["ts"], reverse=True)[:limit]
+
+
+def flush(timeout: float = 5.0) -> bool:
+    """Waits until everything queued so far is written."""
+    if _writer is None:
+        return True
+    done = threading.Event()
+    try:
+        _queue.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+
+def stats() -> Dict[str, int]:
+    return {**_stats, "queued": _queue.qsize()}
+
+
+atexit.register(flush)
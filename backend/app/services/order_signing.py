@@ -4,7 +4,7 @@ import os
 import sys
 from decimal import Decimal
 from typing import Dict, Optional
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 import httpx
 
@@ -54,6 +54,7 @@ except ImportError as e:
     ) from e
 
 from ..config import get_endpoint_config
+from ..storage.shared_cache import SharedTTLCache
 
 # Import additional required types for TPSL orders
 try:
@@ -62,9 +63,11 @@ try:
 except ImportError:
     pass
 
-# Cache for market models (key: market_name, value: (market_model, expiry_time))
-_market_cache: Dict[str, tuple[MarketModel, datetime]] = {}
+# Market configs are shared by all uvicorn workers through a host-wide snapshot; each worker only keeps
+# the decoded MarketModel for the snapshot entry it last saw (key: market_name, value: (entry stamp, model)).
 _CACHE_TTL_MINUTES = 10  # Cache market data for 10 minutes
+_MARKET_CACHE = SharedTTLCache("extended-markets", ttl_seconds=_CACHE_TTL_MINUTES * 60)
+_decoded_markets: Dict[str, tuple[float, MarketModel]] = {}
 
 
 def _get_env_config(use_mainnet: bool):
@@ -72,35 +75,35 @@ def _get_env_config(use_mainnet: bool):
 
 
 def _fetch_market_model(api_base_url: str, market_name: str) -> MarketModel:
-    """Fetch market model from mainnet only, with caching."""
-    # Check cache first
-    now = datetime.now()
-    if market_name in _market_cache:
-        market_model, expiry = _market_cache[market_name]
-        if now < expiry:
-            print(f"[ORDER-SIGNING] Using cached market data for {market_name}")
-            return market_model
-        else:
-            # Cache expired, remove it
-            del _market_cache[market_name]
-    
+    """Fetch market model from mainnet only, with caching shared across workers."""
     # Always use mainnet
     mainnet_url = api_base_url.replace("sepolia.", "") if "sepolia" in api_base_url else api_base_url
     url = f"{mainnet_url}/info/markets"
-    print(f"[ORDER-SIGNING] Fetching market data for {market_name} from {url}")
-    with httpx.Client(timeout=15.0) as client:
-        res = client.get(url, params={"market": market_name})
-        res.raise_for_status()
-        data = res.json().get("data") or []
-        if not data:
-            raise ValueError(f"Market '{market_name}' not found on mainnet")
-        market_model = MarketModel.model_validate(data[0])
-        
-        # Cache it
-        expiry = now + timedelta(minutes=_CACHE_TTL_MINUTES)
-        _market_cache[market_name] = (market_model, expiry)
-        print(f"[ORDER-SIGNING] Cached market data for {market_name} (expires in {_CACHE_TTL_MINUTES} minutes)")
-        return market_model
+
+    def _load() -> dict:
+        print(f"[ORDER-SIGNING] Fetching market data for {market_name} from {url}")
+        with httpx.Client(timeout=15.0) as client:
+            res = client.get(url, params={"market": market_name})
+            res.raise_for_status()
+            data = res.json().get("data") or []
+            if not data:
+                raise ValueError(f"Market '{market_name}' not found on mainnet")
+            print(f"[ORDER-SIGNING] Cached market data for {market_name} (expires in {_CACHE_TTL_MINUTES} minutes)")
+            return data[0]
+
+    entry = _MARKET_CACHE.get_or_load(market_name, _load)
+    decoded = _decoded_markets.get(market_name)
+    if decoded is not None and decoded[0] == entry["exp"]:
+        return decoded[1]
+    market_model = MarketModel.model_validate(entry["v"])
+    _decoded_markets[market_name] = (entry["exp"], market_model)
+    return market_model
+
+
+def get_market_risk_tiers(market_name: str) -> list[tuple[float, float]]:
+    """`(upper bound, risk factor)` of each risk tier of the market, from the shared market cache."""
+    tiers = _fetch_market_model(get_endpoint_config().api_base_url, market_name).trading_config.risk_factor_config
+    return [(float(t.upper_bound), float(t.risk_factor)) for t in tiers]
 
 
 def build_signed_limit_order_json(
@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# Margin usage and distance to liquidation of every open position of every account, recomputed in one pass
+# over flat arrays per mark-price tick. Positions are kept sorted by market, so the tiered risk factor of a
+# market's positions is one `searchsorted` over its sorted tier bounds, and the per-account sums are `bincount`s.
+#
+# Requirement of a position: notional * risk factor of the first tier whose upper bound is >= the notional (the
+# same tier as `TradingConfigModel.max_leverage_for_position_value`, above the last tier the whole notional).
+# Equity: collateral balance + unrealised PnL at the mark. The liquidation price of a position is where the
+# account's equity meets its requirement when only that market moves, at the position's current tier.
+#
+# Marks come from the shared ticker snapshot every RISK_MARKS_REFRESH_SECONDS (0 disables), on a daemon thread
+# started with the first risk request; each refresh re-evaluates every tracked account and logs the positions
+# within RISK_ALERT_DISTANCE of liquidation. Before that the positions and balance of every tracked account are
+# taken again from its account mirror; an account without a loaded mirror is dropped once its data is older than
+# RISK_ACCOUNT_TTL_SECONDS, and an account without a risk request for RISK_ACCOUNT_IDLE_SECONDS is dropped too.
+_MARKS_REFRESH_SECONDS = float(os.getenv("RISK_MARKS_REFRESH_SECONDS", "2"))
+_ALERT_DISTANCE = float(os.getenv("RISK_ALERT_DISTANCE", "0.05"))
+_ACCOUNT_TTL_SECONDS = float(os.getenv("RISK_ACCOUNT_TTL_SECONDS", "30"))
+_ACCOUNT_IDLE_SECONDS = float(os.getenv("RISK_ACCOUNT_IDLE_SECONDS", "900"))
+
+AccountKey = Tuple[str, int]
+
+# Risk factor above the last tier: the position needs its whole notional as margin
+_OVER_LAST_TIER_FACTOR = 1.0
+
+
+@dataclass
+class _Position:
+    market: str
+    size: float  # signed: positive long, negative short
+    open_price: float
+
+
+class RiskSnapshot:
+    """
+    Result of one `RiskEngine.evaluate()`, arrays indexed by position (sorted by market) and by account.
+    """
+
+    def __init__(self, accounts: List[AccountKey], markets: List[str], arrays: Dict[str, np.ndarray]) -> None:
+        self.accounts = accounts
+        self.markets = markets
+        self.arrays = arrays
+        self._account_index = {key: index for index, key in enumerate(accounts)}
+
+    def account(self, key: AccountKey) -> Optional[Dict[str, Any]]:
+        index = self._account_index.get(key)
+        if index is None:
+            return None
+        a = self.arrays
+        positions = np.flatnonzero(a["position_account"] == index)
+        return {
+            "equity": float(a["equity"][index]),
+            "exposure": float(a["exposure"][index]),
+            "margin_requirement": float(a["account_requirement"][index]),
+            "margin_usage": float(a["margin_usage"][index]),
+            "positions": [self._position(i) for i in positions],
+        }
+
+    def _position(self, i: int) -> Dict[str, Any]:
+        a = self.arrays
+        return {
+            "market": self.markets[a["position_market"][i]],
+            "side": "LONG" if a["size"][i] > 0 else "SHORT",
+            "size": float(abs(a["size"][i])),
+            "mark_price": float(a["mark"][i]),
+            "notional": float(a["notional"][i]),
+            "risk_factor": float(a["risk_factor"][i]),
+            "margin_requirement": float(a["requirement"][i]),
+            "liquidation_price": _finite_or_none(a["liquidation_price"][i]),
+            "liquidation_distance": _finite_or_none(a["liquidation_distance"][i]),
+        }
+
+    def at_risk(self, max_distance: float) -> List[Dict[str, Any]]:
+        """Positions whose liquidation price is within `max_distance` (fraction of the mark) of the mark."""
+        a = self.arrays
+        indexes = np.flatnonzero(a["liquidation_distance"] <= max_distance)
+        indexes = indexes[np.argsort(a["liquidation_distance"][indexes], kind="stable")]
+        result = []
+        for i in indexes:
+            wallet_address, account_index = self.accounts[a["position_account"][i]]
+            result.append({"wallet_address": wallet_address, "account_index": account_index, **self._position(i)})
+        return result
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+class RiskEngine:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self._market_index: Dict[str, int] = {}
+        self._markets: List[str] = []
+        self._tier_bounds: List[np.ndarray] = []
+        # One factor per tier plus `_OVER_LAST_TIER_FACTOR`, so the `searchsorted` result indexes it directly
+        self._tier_factors: List[np.ndarray] = []
+        self._marks = np.full(0, np.nan)
+        self._collateral: Dict[AccountKey, float] = {}
+        self._positions: Dict[AccountKey, List[_Position]] = {}
+        # time.monotonic() of the last `set_account` of each account
+        self._updated_at: Dict[AccountKey, float] = {}
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._accounts: List[AccountKey] = []
+        self._market_slices: List[Tuple[int, int, int]] = []
+
+    def has_market(self, market: str) -> bool:
+        return market in self._market_index
+
+    def set_market(self, market: str, upper_bounds: Sequence[float], risk_factors: Sequence[float]) -> None:
+        order = np.argsort(np.asarray(upper_bounds, dtype=np.float64), kind="stable")
+        bounds = np.asarray(upper_bounds, dtype=np.float64)[order]
+        factors = np.append(np.asarray(risk_factors, dtype=np.float64)[order], _OVER_LAST_TIER_FACTOR)
+        with self._lock:
+            index = self._market_index.get(market)
+            if index is None:
+                index = self._market_index[market] = len(self._markets)
+                self._markets.append(market)
+                self._tier_bounds.append(bounds)
+                self._tier_factors.append(factors)
+                self._marks = np.append(self._marks, np.nan)
+            else:
+                self._tier_bounds[index] = bounds
+                self._tier_factors[index] = factors
+
+    def set_account(self, key: AccountKey, collateral: float, positions: Iterable[Tuple[str, float, float]]) -> None:
+        """Replaces the account's positions: `(market, signed size, open price)`; markets must be set first."""
+        rows = [_Position(market, float(size), float(open_price)) for market, size, open_price in positions if size]
+        unknown = {row.market for row in rows} - self._market_index.keys()
+        if unknown:
+            raise KeyError(f"No risk tiers for markets {sorted(unknown)}")
+        with self._lock:
+            self._updated_at[key] = time.monotonic()
+            # Unchanged accounts keep the arrays of the last build
+            if self._collateral.get(key) == float(collateral) and self._positions.get(key) == rows:
+                return
+            self._collateral[key] = float(collateral)
+            self._positions[key] = rows
+            self._arrays = None
+
+    def remove_account(self, key: AccountKey) -> None:
+        with self._lock:
+            self._collateral.pop(key, None)
+            self._positions.pop(key, None)
+            self._updated_at.pop(key, None)
+            self._arrays = None
+
+    def updated_at(self, key: AccountKey) -> Optional[float]:
+        return self._updated_at.get(key)
+
+    def update_marks(self, marks: Mapping[str, float]) -> None:
+        with self._lock:
+            for market, price in marks.items():
+                index = self._market_index.get(market)
+                if index is not None:
+                    self._marks[index] = float(price)
+
+    def _build(self) -> Dict[str, np.ndarray]:
+        # Called with the lock held after positions changed; ticks reuse the arrays
+        self._accounts = list(self._collateral.keys())
+        arrays, self._market_slices = self._arrays_of(self._accounts)
+        return arrays
+
+    def _arrays_of(self, accounts: List[AccountKey]) -> Tuple[Dict[str, np.ndarray], List[Tuple[int, int, int]]]:
+        # Called with the lock held
+        account_index = {key: index for index, key in enumerate(accounts)}
+        rows = [
+            (self._market_index[position.market], account_index[key], position.size, position.open_price)
+            for key in accounts
+            for position in self._positions[key]
+        ]
+        rows.sort(key=lambda row: row[0])
+        markets = np.array([row[0] for row in rows], dtype=np.int64)
+        # Contiguous slice of each market present
+        present, starts = np.unique(markets, return_index=True)
+        ends = np.append(starts[1:], len(rows))
+        arrays = {
+            "position_market": markets,
+            "position_account": np.array([row[1] for row in rows], dtype=np.int64),
+            "size": np.array([row[2] for row in rows], dtype=np.float64),
+            "open_price": np.array([row[3] for row in rows], dtype=np.float64),
+            "collateral": np.array([self._collateral[key] for key in accounts], dtype=np.float64),
+        }
+        return arrays, [(int(m), int(s), int(e)) for m, s, e in zip(present, starts, ends)]
+
+    def evaluate(self) -> RiskSnapshot:
+        with self._lock:
+            if self._arrays is None:
+                self._arrays = self._build()
+            base = self._arrays
+            marks = self._marks.copy()
+            slices = self._market_slices
+            accounts = self._accounts
+            markets = list(self._markets)
+            tier_bounds = self._tier_bounds
+            tier_factors = self._tier_factors
+        return RiskSnapshot(accounts, markets, _compute(base, slices, marks, tier_bounds, tier_factors))
+
+    def evaluate_account(self, key: AccountKey) -> RiskSnapshot:
+        """Like `evaluate()` over this account alone, without rebuilding the arrays of every account."""
+        with self._lock:
+            accounts = [key] if key in self._collateral else []
+            base, slices = self._arrays_of(accounts)
+            marks = self._marks.copy()
+            markets = list(self._markets)
+            tier_bounds = self._tier_bounds
+            tier_factors = self._tier_factors
+        return RiskSnapshot(accounts, markets, _compute(base, slices, marks, tier_bounds, tier_factors))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clear()
+
+
+def _compute(
+    base: Dict[str, np.ndarray],
+    slices: List[Tuple[int, int, int]],
+    marks: np.ndarray,
+    tier_bounds: List[np.ndarray],
+    tier_factors: List[np.ndarray],
+) -> Dict[str, np.ndarray]:
+    size = base["size"]
+    position_account = base["position_account"]
+    mark = marks[base["position_market"]]
+    notional = np.abs(size) * mark
+    risk_factor = np.empty_like(notional)
+    for market, start, end in slices:
+        tiers = np.searchsorted(tier_bounds[market], notional[start:end], side="left")
+        risk_factor[start:end] = tier_factors[market][tiers]
+    requirement = notional * risk_factor
+
+    account_count = len(base["collateral"])
+    unrealised = size * (mark - base["open_price"])
+    equity = base["collateral"] + np.bincount(position_account, weights=unrealised, minlength=account_count)
+    account_requirement = np.bincount(position_account, weights=requirement, minlength=account_count)
+    exposure = np.bincount(position_account, weights=notional, minlength=account_count)
+    margin_usage = np.divide(account_requirement, equity, out=np.full(account_count, np.inf), where=equity > 0)
+
+    # equity + size * move == requirement + |size| * risk_factor * move, solved for the price move
+    gap = account_requirement[position_account] - equity[position_account]
+    slope = size - np.abs(size) * risk_factor
+    # A long at a risk factor >= 1 loses margin as fast as equity, this market alone cannot liquidate it
+    reachable = slope * size > 0
+    move = np.divide(gap, slope, out=np.full_like(gap, np.nan), where=reachable)
+    liquidation_price = np.where(reachable, mark + move, np.nan)
+    liquidation_distance = np.where(gap >= 0, 0.0, np.where(reachable, np.abs(move) / mark, np.inf))
+
+    return {
+        **base,
+        "mark": mark,
+        "notional": notional,
+        "risk_factor": risk_factor,
+        "requirement": requirement,
+        "equity": equity,
+        "exposure": exposure,
+        "account_requirement": account_requirement,
+        "margin_usage": margin_usage,
+        "liquidation_price": liquidation_price,
+        "liquidation_distance": liquidation_distance,
+    }
+
+
+ENGINE = RiskEngine()
+_refresher: Optional[threading.Thread] = None
+_refresher_lock = threading.Lock()
+# Accounts loaded by a risk request: api key and time.monotonic() of the last request
+_tracked: Dict[AccountKey, Tuple[str, float]] = {}
+_tracked_lock = threading.Lock()
+
+
+def _ensure_market(market: str) -> None:
+    if ENGINE.has_market(market):
+        return
+    from .order_signing import get_market_risk_tiers
+
+    tiers = get_market_risk_tiers(market)
+    ENGINE.set_market(market, [bound for bound, _ in tiers], [factor for _, factor in tiers])
+
+
+def _set_account(key: AccountKey, collateral: float, positions: List[Dict[str, Any]]) -> None:
+    # `positions` as returned by /user/positions
+    for p in positions:
+        _ensure_market(p["market"])
+    ENGINE.set_account(
+        key,
+        collateral,
+        [
+            (p["market"], float(p["size"]) * (1 if p["side"] == "LONG" else -1), float(p["openPrice"]))
+            for p in positions
+        ],
+    )
+
+
+def load_account(key: AccountKey, api_key: str, collateral: float, positions: List[Dict[str, Any]]) -> None:
+    """Sets the account from a risk request and keeps it tracked by the mark refresh."""
+    _set_account(key, collateral, positions)
+    ENGINE.update_marks({p["market"]: float(p["markPrice"]) for p in positions})
+    with _tracked_lock:
+        _tracked[key] = (api_key, time.monotonic())
+    start_mark_refresh()
+
+
+def _refresh_accounts() -> None:
+    from . import account_mirror
+
+    now = time.monotonic()
+    with _tracked_lock:
+        tracked = list(_tracked.items())
+    for key, (api_key, requested_at) in tracked:
+        if now - requested_at < _ACCOUNT_IDLE_SECONDS:
+            positions = account_mirror.positions(api_key)
+            balance = account_mirror.balance(api_key)
+            if positions is not None and balance is not None:
+                try:
+                    _set_account(key, float(balance.get("balance") or 0), positions)
+                except Exception as e:
+                    print(f"[RISK] Failed to refresh account {key}: {e}")
+            updated_at = ENGINE.updated_at(key)
+            if updated_at is not None and now - updated_at < _ACCOUNT_TTL_SECONDS:
+                continue
+        # Idle, or its positions are too old to alert on
+        with _tracked_lock:
+            if _tracked.get(key, (None, None))[1] == requested_at:
+                del _tracked[key]
+                ENGINE.remove_account(key)
+
+
+def _refresh_marks() -> None:
+    from . import ticker
+
+    while True:
+        time.sleep(_MARKS_REFRESH_SECONDS)
+        try:
+            _refresh_accounts()
+            ENGINE.update_marks(ticker.marks())
+            at_risk = ENGINE.evaluate().at_risk(_ALERT_DISTANCE)
+        except Exception as e:
+            print(f"[RISK] Mark refresh failed: {e}")
+            continue
+        if at_risk:
+            print(f"[RISK] {len(at_risk)} positions within {_ALERT_DISTANCE:.0%} of liquidation")
+
+
+def start_mark_refresh() -> None:
+    global _refresher
+    if _refresher is not None or _MARKS_REFRESH_SECONDS <= 0:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_marks, name="risk-marks", daemon=True)
+            _refresher.start()
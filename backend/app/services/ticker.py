@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..config import get_endpoint_config
+from ..storage.shared_cache import SharedSnapshot
+
+
+# Latest market stats of every market for the mobile market list, shared by the workers through a
+# `SharedSnapshot`. A refresh (at most every TICKER_REFRESH_SECONDS, by whichever request finds the data stale)
+# pulls `/info/markets` once and bumps the version only when a value changed. Every value carries the version
+# it last changed at, so `delta(since)` returns just the fields changed after any earlier version. Versions are
+# tokens `<epoch>-<n>`: a snapshot recreated from scratch gets a new epoch, and a token of another epoch (or one
+# older than the removals kept) is answered with the full snapshot. Response bodies are serialized once per
+# version and `since`.
+FIELDS: Tuple[str, ...] = (
+    "lastPrice",
+    "markPrice",
+    "indexPrice",
+    "dailyPriceChange",
+    "dailyPriceChangePercentage",
+    "dailyVolume",
+    "fundingRate",
+    "openInterest",
+)
+_REFRESH_SECONDS = float(os.getenv("TICKER_REFRESH_SECONDS", "2"))
+# Removed markets are remembered for this many versions; older tokens get the full snapshot
+_REMOVALS_KEPT_VERSIONS = 10_000
+_BODY_CACHE_SIZE = 256
+
+_snapshot: Optional[SharedSnapshot] = None
+_refresh_lock = threading.Lock()
+_body_cache: "OrderedDict[Tuple[str, Optional[str]], bytes]" = OrderedDict()
+_body_cache_lock = threading.Lock()
+
+
+def _shared() -> SharedSnapshot:
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = SharedSnapshot("extended-ticker")
+    return _snapshot
+
+
+def _fetch_market_stats() -> Dict[str, List[Optional[str]]]:
+    url = f"{get_endpoint_config().api_base_url}/info/markets"
+    with httpx.Client(timeout=15.0) as client:
+        res = client.get(url)
+        res.raise_for_status()
+        markets = res.json().get("data") or []
+    return {
+        m["name"]: [_value((m.get("marketStats") or {}).get(field)) for field in FIELDS]
+        for m in markets
+        if m.get("name")
+    }
+
+
+def _value(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _apply(data: Dict[str, Any], stats: Dict[str, List[Optional[str]]]) -> None:
+    """Merges fetched stats into the snapshot document, stamping what changed with the next version."""
+    if not data.get("epoch"):
+        data.update(epoch=secrets.token_hex(4), version=0, markets={}, changed={}, removed={})
+    version = data["version"] + 1
+    markets = dict(data["markets"])
+    changed = dict(data["changed"])
+    removed = {m: v for m, v in data["removed"].items() if v > version - _REMOVALS_KEPT_VERSIONS}
+    any_change = False
+    for name, values in stats.items():
+        old = markets.get(name)
+        if old == values:
+            continue
+        old_stamps = changed.get(name) or [version] * len(FIELDS)
+        changed[name] = [
+            version if old is None or old[i] != values[i] else old_stamps[i] for i in range(len(FIELDS))
+        ]
+        markets[name] = values
+        removed.pop(name, None)
+        any_change = True
+    for name in [name for name in markets if name not in stats]:
+        del markets[name]
+        del changed[name]
+        removed[name] = version
+        any_change = True
+    data["fetched_at"] = time.time()
+    if any_change:
+        data.update(version=version, markets=markets, changed=changed, removed=removed)
+
+
+def _read() -> Dict[str, Any]:
+    _, data = _shared().read()
+    stale = not data or time.time() - data.get("fetched_at", 0) >= _REFRESH_SECONDS
+    # One refresh per worker at a time; the other requests answer from the current data meanwhile
+    if stale and _refresh_lock.acquire(blocking=not data):
+        try:
+
+            def _refresh(doc: Dict[str, Any]) -> None:
+                # Another worker may have refreshed while this one waited for the lock
+                if doc and time.time() - doc.get("fetched_at", 0) < _REFRESH_SECONDS:
+                    return
+                _apply(doc, _fetch_market_stats())
+
+            try:
+                _shared().update(_refresh)
+            except Exception as e:
+                if not data:
+                    raise
+                print(f"[TICKER] Refresh failed, serving the previous stats: {e}")
+            _, data = _shared().read()
+        finally:
+            _refresh_lock.release()
+    return data
+
+
+def _token(data: Dict[str, Any]) -> str:
+    return f"{data['epoch']}-{data['version']}"
+
+
+def _cached_body(data: Dict[str, Any], since: Optional[str], build) -> bytes:
+    key = (_token(data), since)
+    with _body_cache_lock:
+        body = _body_cache.get(key)
+        if body is not None:
+            _body_cache.move_to_end(key)
+            return body
+    body = json.dumps(build(), separators=(",", ":")).encode()
+    with _body_cache_lock:
+        _body_cache[key] = body
+        while len(_body_cache) > _BODY_CACHE_SIZE:
+            _body_cache.popitem(last=False)
+    return body
+
+
+def _full(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"version": _token(data), "full": True, "fields": list(FIELDS), "markets": data["markets"]}
+
+
+def snapshot() -> Tuple[str, bytes]:
+    """`(version, body)` of the compact snapshot: one array of `FIELDS` values per market."""
+    data = _read()
+    return _token(data), _cached_body(data, None, lambda: _full(data))
+
+
+def marks() -> Dict[str, float]:
+    """Mark price of every market with one."""
+    index = FIELDS.index("markPrice")
+    return {name: float(values[index]) for name, values in _read()["markets"].items() if values[index] is not None}
+
+
+def market_names() -> List[str]:
+    return list(_read()["markets"])
+
+
+def _parse(token: str) -> Tuple[str, int]:
+    epoch, _, version = token.rpartition("-")
+    return epoch, int(version) if version.isdigit() else -1
+
+
+def delta(since: str) -> Tuple[str, bytes]:
+    """`(version, body)` with the fields changed after version `since`, or the full snapshot when unknown."""
+    data = _read()
+
+    def build() -> Dict[str, Any]:
+        epoch, version = _parse(since)
+        current = data["version"]
+        if epoch != data["epoch"] or not current - _REMOVALS_KEPT_VERSIONS <= version <= current:
+            return _full(data)
+        changed: Dict[str, Dict[str, Optional[str]]] = {}
+        for name, stamps in data["changed"].items():
+            fields = {FIELDS[i]: data["markets"][name][i] for i, stamp in enumerate(stamps) if stamp > version}
+            if fields:
+                changed[name] = fields
+        removed = [name for name, stamp in data["removed"].items() if stamp > version]
+        return {"version": _token(data), "full": False, "changed": changed, "removed": removed}
+
+    return _token(data), _cached_body(data, since, build)
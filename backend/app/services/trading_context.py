@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import dataclasses
+from typing import Optional
+
+from ..storage import STORE
+from ..storage.memory import UserRecord
+from ..storage.shared_cache import SharedTTLCache
+
+
+# Per-user credentials/vault needed on the order path, shared by all workers so a hot account costs one
+# store lookup per TTL instead of one per request per worker. Any write to the user must call
+# `invalidate_trading_context` so other workers stop serving the old record. The entries hold the API and
+# signing keys, which is why the cache directory is private to the backend's user (see `get_shared_cache_dir`).
+_CONTEXT_TTL_SECONDS = 300
+_CONTEXT_CACHE = SharedTTLCache("extended-trading-context", ttl_seconds=_CONTEXT_TTL_SECONDS)
+
+
+def _cache_key(wallet_address: str, account_index: int) -> str:
+    return f"{wallet_address.lower()}:{account_index}"
+
+
+class _UnknownUser(Exception):
+    """Raised by the loader so a missing user is not cached and onboarding is seen on the next request."""
+
+
+def get_trading_context(wallet_address: str, account_index: int) -> Optional[UserRecord]:
+    def _load() -> dict:
+        record = STORE.get_user(wallet_address=wallet_address, account_index=account_index)
+        if record is None:
+            raise _UnknownUser()
+        return {field.name: getattr(record, field.name) for field in dataclasses.fields(UserRecord)}
+
+    # Single-flight across workers: concurrent misses for the same user wait for the one store lookup
+    try:
+        entry = _CONTEXT_CACHE.get_or_load(_cache_key(wallet_address, account_index), _load)
+    except _UnknownUser:
+        return None
+    return UserRecord(**entry["v"])
+
+
+def invalidate_trading_context(wallet_address: str, account_index: int) -> None:
+    _CONTEXT_CACHE.delete(_cache_key(wallet_address, account_index))
@@ -4,6 +4,7 @@ from typing import Optional
 
 from .memory import MemoryStore
 from .db import DatabaseStore, get_db_url_from_env
+from .sqlite import SQLiteStore, get_sqlite_path_from_env
 
 
 def _init_store():
@@ -18,8 +19,19 @@ def _init_store():
             print(f"[STORAGE] ⚠️ Failed to initialize DatabaseStore: {e}")
             print(f"[STORAGE] Falling back to MemoryStore")
             pass
+        return MemoryStore()
+    sqlite_path: Optional[str] = get_sqlite_path_from_env()
+    if sqlite_path:
+        try:
+            print(f"[STORAGE] SQLITE_STORE_PATH found, initializing SQLiteStore...")
+            store = SQLiteStore(sqlite_path)
+            print(f"[STORAGE] ✅ SQLiteStore initialized successfully")
+            return store
+        except Exception as e:
+            print(f"[STORAGE] ⚠️ Failed to initialize SQLiteStore: {e}")
+            print(f"[STORAGE] Falling back to MemoryStore")
     else:
-        print(f"[STORAGE] ⚠️ No DATABASE_URL found, using MemoryStore (data will be lost on restart)")
+        print(f"[STORAGE] ⚠️ No DATABASE_URL or SQLITE_STORE_PATH found, using MemoryStore (data will be lost on restart)")
     return MemoryStore()
 
 
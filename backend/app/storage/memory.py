@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import secrets
+import threading
 import time
-from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, List, Optional, Tuple
 
 
 @dataclass
@@ -16,10 +18,25 @@ class UserRecord:
     vault: Optional[int] = None
 
 
+@dataclass
+class IdempotencyRecord:
+    key: str
+    fingerprint: str
+    expires_at: float
+    status_code: Optional[int] = None  # None while the original request is still in flight
+    response: Any = None
+
+
 class MemoryStore:
+    MAX_IDEMPOTENCY_RECORDS = 10_000
+    MAX_JOURNAL_ENTRIES_PER_ACCOUNT = 1_000
+
     def __init__(self) -> None:
         self._users: Dict[Tuple[str, int], UserRecord] = {}
         self._session_nonces: Dict[str, Tuple[str, float]] = {}
+        self._idempotency: "OrderedDict[str, IdempotencyRecord]" = OrderedDict()
+        self._idempotency_lock = threading.Lock()
+        self._order_journal: Dict[Tuple[str, int], Deque[Dict[str, Any]]] = {}
 
     def upsert_user(
         self,
@@ -61,6 +78,70 @@ class MemoryStore:
         del self._session_nonces[wallet_address.lower()]
         return True
 
+    def claim_idempotency_key(self, key: str, fingerprint: str, lease_seconds: float) -> Optional[IdempotencyRecord]:
+        """Claim `key` for a new request. Returns None when claimed, otherwise the live record of the first request."""
+        now = time.time()
+        with self._idempotency_lock:
+            existing = self._idempotency.get(key)
+            if existing is not None and existing.expires_at > now:
+                return replace(existing)
+            self._idempotency[key] = IdempotencyRecord(key=key, fingerprint=fingerprint, expires_at=now + lease_seconds)
+            self._idempotency.move_to_end(key)
+            excess = len(self._idempotency) - self.MAX_IDEMPOTENCY_RECORDS
+            if excess > 0:
+                # Oldest first, never a request still in flight
+                evicted = []
+                for old_key, record in self._idempotency.items():
+                    if record.status_code is not None or record.expires_at <= now:
+                        evicted.append(old_key)
+                        if len(evicted) == excess:
+                            break
+                for old_key in evicted:
+                    del self._idempotency[old_key]
+            return None
+
+    def renew_idempotency_key(self, key: str, lease_seconds: float) -> None:
+        """Extends the lease of a request still in flight."""
+        with self._idempotency_lock:
+            record = self._idempotency.get(key)
+            if record is not None and record.status_code is None:
+                record.expires_at = time.time() + lease_seconds
+
+    def complete_idempotency_key(self, key: str, status_code: int, response: Any, ttl_seconds: float) -> None:
+        with self._idempotency_lock:
+            record = self._idempotency.get(key)
+            if record is None:
+                return
+            record.status_code = status_code
+            record.response = response
+            record.expires_at = time.time() + ttl_seconds
+
+    def release_idempotency_key(self, key: str) -> None:
+        with self._idempotency_lock:
+            self._idempotency.pop(key, None)
+
+    def get_idempotency_record(self, key: str) -> Optional[IdempotencyRecord]:
+        with self._idempotency_lock:
+            record = self._idempotency.get(key)
+            if record is None or record.expires_at <= time.time():
+                return None
+            return replace(record)
+
+    def append_order_journal(self, entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            key = (entry["wallet_address"].lower(), entry["account_index"])
+            journal = self._order_journal.get(key)
+            if journal is None:
+                journal = self._order_journal.setdefault(key, deque(maxlen=self.MAX_JOURNAL_ENTRIES_PER_ACCOUNT))
+            journal.append(entry)
+
+    def recent_order_journal(self, wallet_address: str, account_index: int, limit: int) -> List[Dict[str, Any]]:
+        """Newest first."""
+        journal = self._order_journal.get((wallet_address.lower(), account_index))
+        if not journal:
+            return []
+        return sorted(journal, key=lambda entry: entry["ts"], reverse=True)[:limit]
+
 
 # Note: The default STORE is now selected in storage/__init__.py
 
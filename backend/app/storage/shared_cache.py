@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms run a single worker
+    fcntl = None  # type: ignore[assignment]
+
+
+# Snapshot file layout: magic, version, payload length, then the JSON payload.
+_HEADER = struct.Struct("<4sQI")
+_MAGIC = b"XSC1"
+
+
+def _private_dir(path: str) -> str:
+    # The caches hold API keys and signing keys: only this user may list or open them.
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise RuntimeError(f"Shared cache directory {path} belongs to another user")
+    if st.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
+
+
+def get_shared_cache_dir() -> str:
+    # /dev/shm keeps the snapshots in RAM on Linux (Railway); fall back to the regular temp dir elsewhere.
+    # Either way in a private (0700) directory of this user, not in the world-readable parent.
+    configured = os.getenv("SHARED_CACHE_DIR")
+    if configured:
+        return _private_dir(configured)
+    parent = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return _private_dir(os.path.join(parent, f"extended-backend-{uid}"))
+
+
+class SharedSnapshot:
+    """
+    Versioned JSON document shared by every worker process on the host.
+
+    A writer takes an exclusive flock, writes a complete new snapshot next to the current one and
+    atomically renames it into place. Readers mmap the current file read-only and only decode the
+    payload when its version changed, so a steady-state read costs a single `stat`.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = None) -> None:
+        directory = directory or get_shared_cache_dir()
+        self._path = os.path.join(directory, f"{name}.snapshot")
+        self._lock_path = os.path.join(directory, f"{name}.lock")
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._file_key: Optional[Tuple[int, int, int]] = None
+        self._version = 0
+        self._data: Dict[str, Any] = {}
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def read(self) -> Tuple[int, Dict[str, Any]]:
+        """Return `(version, data)` of the current snapshot. The returned dict must not be mutated."""
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            return 0, {}
+        file_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._read_lock:
+            if file_key != self._file_key:
+                self._load()
+                self._file_key = file_key
+            return self._version, self._data
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    magic, version, length = _HEADER.unpack_from(mm, 0)
+                    if magic != _MAGIC:
+                        print(f"[SHARED-CACHE] ⚠️ Ignoring snapshot with unknown format: {self._path}")
+                        self._version, self._data = 0, {}
+                        return
+                    if version != self._version:
+                        self._data = json.loads(mm[_HEADER.size:_HEADER.size + length])
+                        self._version = version
+        except (FileNotFoundError, ValueError, struct.error) as e:
+            print(f"[SHARED-CACHE] ⚠️ Could not read snapshot {self._path}: {e}")
+            self._version, self._data = 0, {}
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        with self._write_lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def update(self, mutate: Callable[[Dict[str, Any]], None]) -> int:
+        """Apply `mutate` to a copy of the latest snapshot and publish it. Returns the new version."""
+        with self._exclusive():
+            return self._publish(mutate)
+
+    def _publish(self, mutate: Callable[[Dict[str, Any]], None]) -> int:
+        version, data = self.read()
+        new_data = dict(data)
+        mutate(new_data)
+        new_version = version + 1
+        payload = json.dumps(new_data, separators=(",", ":")).encode()
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(self._path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, new_version, len(payload)))
+                f.write(payload)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return new_version
+
+
+class SharedTTLCache:
+    """
+    Key/value cache with per-entry expiry shared by every worker process on the host, one file per key.
+
+    A set writes only its key's file (magic, expiry, payload length, JSON value) and atomically renames it
+    into place; a delete unlinks it. A reader `stat`s the key's file and decodes it only when it changed, so
+    every worker keeps decoded just the entries it reads rather than the whole cache.
+
+    `get_or_load` is single-flight across workers per key: a miss takes that key's flock, re-checks and only
+    then calls the loader, so upstream fetches stay constant however many workers are running. Other keys are
+    not blocked meanwhile, and a waiter that waited `load_wait_seconds` loads on its own.
+    """
+
+    _ENTRY = struct.Struct("<4sdI")
+    _ENTRY_MAGIC = b"XTC1"
+    _LOCK_POLL_SECONDS = 0.05
+
+    def __init__(
+        self, name: str, ttl_seconds: float, directory: Optional[str] = None, load_wait_seconds: float = 20.0
+    ) -> None:
+        self._directory = _private_dir(os.path.join(directory or get_shared_cache_dir(), name))
+        self._ttl_seconds = ttl_seconds
+        self._load_wait_seconds = load_wait_seconds
+        self._local_lock = threading.Lock()
+        # key -> (file identity, decoded entry) of the entries this worker read
+        self._decoded: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+        self._pruned_at = 0.0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, quote(key, safe="") + ".entry")
+
+    def _read_file(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            with self._local_lock:
+                self._decoded.pop(key, None)
+            return None
+        file_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._local_lock:
+            decoded = self._decoded.get(key)
+        if decoded is not None and decoded[0] == file_key:
+            return decoded[1]
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            magic, expiry, length = self._ENTRY.unpack_from(raw, 0)
+            if magic != self._ENTRY_MAGIC:
+                raise ValueError("unknown format")
+            entry = {"v": json.loads(raw[self._ENTRY.size:self._ENTRY.size + length]), "exp": expiry}
+        except FileNotFoundError:
+            return None
+        except (ValueError, struct.error) as e:
+            print(f"[SHARED-CACHE] ⚠️ Could not read cache entry {path}: {e}")
+            return None
+        with self._local_lock:
+            self._decoded[key] = (file_key, entry)
+        return entry
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._read_file(key)
+        if entry is None or entry["exp"] < time.time():
+            return None
+        return entry
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the raw `{"v": value, "exp": expiry}` entry; `exp` doubles as a change stamp."""
+        return self._lookup(key)
+
+    def get(self, key: str) -> Any:
+        entry = self._lookup(key)
+        return entry["v"] if entry is not None else None
+
+    def set(self, key: str, value: Any) -> Dict[str, Any]:
+        entry = {"v": value, "exp": time.time() + self._ttl_seconds}
+        payload = json.dumps(value, separators=(",", ":")).encode()
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self._directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._ENTRY.pack(self._ENTRY_MAGIC, entry["exp"], len(payload)))
+                f.write(payload)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._maybe_prune()
+        return entry
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+        with self._local_lock:
+            self._decoded.pop(key, None)
+
+    @contextmanager
+    def _key_lock(self, key: str) -> Iterator[bool]:
+        """Holds the key's flock; yields False when it could not be taken within `load_wait_seconds`."""
+        if fcntl is None:
+            yield True
+            return
+        fd = os.open(self._path(key) + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = time.monotonic() + self._load_wait_seconds
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        yield False
+                        return
+                    time.sleep(self._LOCK_POLL_SECONDS)
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Dict[str, Any]:
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry
+        with self._key_lock(key) as locked:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            if not locked:
+                print(f"[SHARED-CACHE] ⚠️ Gave up waiting for another worker to load {key}, loading it here")
+            return self.set(key, loader())
+
+    def _maybe_prune(self) -> None:
+        # Expired entries are only dropped here, at most once per TTL and worker
+        now = time.time()
+        if now - self._pruned_at < max(self._ttl_seconds, 60):
+            return
+        self._pruned_at = now
+        for name in os.listdir(self._directory):
+            if not name.endswith(".entry"):
+                continue
+            path = os.path.join(self._directory, name)
+            try:
+                with open(path, "rb") as f:
+                    _, expiry, _ = self._ENTRY.unpack(f.read(self._ENTRY.size))
+                # The key's lock file stays: a worker may be waiting on it
+                if expiry < now:
+                    os.unlink(path)
+            except (OSError, struct.error):
+                continue
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .memory import IdempotencyRecord, UserRecord
+
+
+# Embedded store for single-node deployments: no network round trip per lookup like `DatabaseStore`, and
+# unlike `MemoryStore` it survives restarts. WAL lets the uvicorn workers read while one of them writes.
+# Every thread has its own connection; the statements are constants, so sqlite3's per-connection statement
+# cache prepares each of them once.
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        wallet_address TEXT NOT NULL,
+        account_index INTEGER NOT NULL,
+        api_key TEXT,
+        stark_private_key TEXT,
+        stark_public_key TEXT,
+        vault INTEGER,
+        PRIMARY KEY (wallet_address, account_index)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_nonces (
+        wallet_address TEXT PRIMARY KEY,
+        nonce TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        status_code INTEGER,
+        response TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at ON idempotency_keys (expires_at)",
+    """
+    CREATE TABLE IF NOT EXISTS order_journal (
+        id TEXT PRIMARY KEY,
+        wallet_address TEXT NOT NULL,
+        account_index INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        entry TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS order_journal_account_ts ON order_journal (wallet_address, account_index, ts)",
+)
+
+# A None argument keeps the stored value, as the other stores do
+_UPSERT_USER = """
+    INSERT INTO users (wallet_address, account_index, api_key, stark_private_key, stark_public_key, vault)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (wallet_address, account_index) DO UPDATE SET
+        api_key = coalesce(excluded.api_key, api_key),
+        stark_private_key = coalesce(excluded.stark_private_key, stark_private_key),
+        stark_public_key = coalesce(excluded.stark_public_key, stark_public_key),
+        vault = coalesce(excluded.vault, vault)
+    RETURNING wallet_address, account_index, api_key, stark_private_key, stark_public_key, vault
+"""
+_GET_USER = """
+    SELECT wallet_address, account_index, api_key, stark_private_key, stark_public_key, vault
+    FROM users WHERE wallet_address = ? AND account_index = ?
+"""
+_SET_NONCE = """
+    INSERT INTO session_nonces (wallet_address, nonce, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (wallet_address) DO UPDATE SET nonce = excluded.nonce, expires_at = excluded.expires_at
+"""
+_CONSUME_NONCE = "DELETE FROM session_nonces WHERE wallet_address = ? AND nonce = ? AND expires_at >= ?"
+_DELETE_EXPIRED_IDEMPOTENCY_KEYS = "DELETE FROM idempotency_keys WHERE expires_at <= ?"
+# Takes over the key only when its previous holder expired
+_CLAIM_IDEMPOTENCY_KEY = """
+    INSERT INTO idempotency_keys (key, fingerprint, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        fingerprint = excluded.fingerprint, expires_at = excluded.expires_at, status_code = NULL, response = NULL
+    WHERE idempotency_keys.expires_at <= ?
+"""
+_COMPLETE_IDEMPOTENCY_KEY = "UPDATE idempotency_keys SET status_code = ?, response = ?, expires_at = ? WHERE key = ?"
+_RENEW_IDEMPOTENCY_KEY = "UPDATE idempotency_keys SET expires_at = ? WHERE key = ? AND status_code IS NULL"
+_RELEASE_IDEMPOTENCY_KEY = "DELETE FROM idempotency_keys WHERE key = ?"
+_GET_IDEMPOTENCY_KEY = """
+    SELECT key, fingerprint, expires_at, status_code, response FROM idempotency_keys WHERE key = ? AND expires_at > ?
+"""
+_APPEND_ORDER_JOURNAL = (
+    "INSERT OR IGNORE INTO order_journal (id, wallet_address, account_index, ts, entry) VALUES (?, ?, ?, ?, ?)"
+)
+_RECENT_ORDER_JOURNAL = """
+    SELECT entry FROM order_journal WHERE wallet_address = ? AND account_index = ? ORDER BY ts DESC LIMIT ?
+"""
+
+
+class SQLiteStore:
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._local = threading.local()
+        print(f"[SQLITE] Opening store at {path}")
+        conn = self._conn()
+        # Persistent for the database file, every later connection is in WAL mode too
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        print(f"[SQLITE] ✅ Tables created/verified")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: each statement is its own transaction
+            conn = sqlite3.connect(self._path, timeout=5.0, isolation_level=None, cached_statements=64)
+            # Durable at checkpoints rather than at every commit, consistent at all times
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def upsert_user(
+        self,
+        wallet_address: str,
+        account_index: int,
+        api_key: Optional[str] = None,
+        stark_private_key: Optional[str] = None,
+        stark_public_key: Optional[str] = None,
+        vault: Optional[int] = None,
+    ) -> UserRecord:
+        row = self._conn().execute(
+            _UPSERT_USER,
+            (wallet_address.lower(), account_index, api_key, stark_private_key, stark_public_key, vault),
+        ).fetchone()
+        return UserRecord(*row)
+
+    def get_user(self, wallet_address: str, account_index: int) -> Optional[UserRecord]:
+        row = self._conn().execute(_GET_USER, (wallet_address.lower(), account_index)).fetchone()
+        return UserRecord(*row) if row else None
+
+    def create_session_nonce(self, wallet_address: str, ttl_seconds: int = 300) -> str:
+        nonce = secrets.token_hex(16)
+        self._conn().execute(_SET_NONCE, (wallet_address.lower(), nonce, time.time() + ttl_seconds))
+        return nonce
+
+    def consume_session_nonce(self, wallet_address: str, nonce: str) -> bool:
+        cursor = self._conn().execute(_CONSUME_NONCE, (wallet_address.lower(), nonce, time.time()))
+        return cursor.rowcount == 1
+
+    def claim_idempotency_key(self, key: str, fingerprint: str, lease_seconds: float) -> Optional[IdempotencyRecord]:
+        now = time.time()
+        conn = self._conn()
+        # Keep the table bounded by its TTL
+        conn.execute(_DELETE_EXPIRED_IDEMPOTENCY_KEYS, (now,))
+        if conn.execute(_CLAIM_IDEMPOTENCY_KEY, (key, fingerprint, now + lease_seconds, now)).rowcount == 1:
+            return None
+        existing = self.get_idempotency_record(key)
+        if existing is None:
+            # The other holder expired between our insert and read; retry once.
+            return self.claim_idempotency_key(key, fingerprint, lease_seconds)
+        return existing
+
+    def complete_idempotency_key(self, key: str, status_code: int, response: Any, ttl_seconds: float) -> None:
+        self._conn().execute(
+            _COMPLETE_IDEMPOTENCY_KEY, (status_code, json.dumps(response), time.time() + ttl_seconds, key)
+        )
+
+    def renew_idempotency_key(self, key: str, lease_seconds: float) -> None:
+        self._conn().execute(_RENEW_IDEMPOTENCY_KEY, (time.time() + lease_seconds, key))
+
+    def release_idempotency_key(self, key: str) -> None:
+        self._conn().execute(_RELEASE_IDEMPOTENCY_KEY, (key,))
+
+    def get_idempotency_record(self, key: str) -> Optional[IdempotencyRecord]:
+        row = self._conn().execute(_GET_IDEMPOTENCY_KEY, (key, time.time())).fetchone()
+        if row is None:
+            return None
+        key, fingerprint, expires_at, status_code, response = row
+        return IdempotencyRecord(
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=expires_at,
+            status_code=status_code,
+            response=json.loads(response) if response is not None else None,
+        )
+
+    def append_order_journal(self, entries: List[Dict[str, Any]]) -> None:
+        rows = [
+            (e["id"], e["wallet_address"].lower(), e["account_index"], e["ts"], json.dumps(e, default=str))
+            for e in entries
+        ]
+        conn = self._conn()
+        # One transaction per batch
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(_APPEND_ORDER_JOURNAL, rows)
+
+    def recent_order_journal(self, wallet_address: str, account_index: int, limit: int) -> List[Dict[str, Any]]:
+        """Newest first."""
+        rows = self._conn().execute(_RECENT_ORDER_JOURNAL, (wallet_address.lower(), account_index, limit))
+        return [json.loads(entry) for (entry,) in rows]
+
+
+def get_sqlite_path_from_env() -> Optional[str]:
+    # Example: /var/lib/extended-backend/store.db
+    return os.getenv("SQLITE_STORE_PATH")
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Keep the host-wide shared caches of test runs away from /dev/shm of a real deployment.
+os.environ.setdefault("SHARED_CACHE_DIR", tempfile.mkdtemp(prefix="extended-backend-tests-"))
+# No background mark refresh against the upstream ticker.
+os.environ.setdefault("RISK_MARKS_REFRESH_SECONDS", "0")
@@ -0,0 +1,95 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routes import proxy
+from backend.app.services import account_mirror
+
+
+client = TestClient(app)
+
+PARAMS = {"wallet_address": "0xmirror", "account_index": 0}
+
+
+class FakeModel:
+    def __init__(self, **fields):
+        self.fields = fields
+
+    def to_api_request_json(self):
+        return self.fields
+
+
+class FakeAccountState:
+    def __init__(self, loaded: bool):
+        self.loaded = loaded
+        self.balance = FakeModel(collateralName="USD", balance="1000")
+
+    def get_open_orders(self):
+        return [FakeModel(id=1, market="BTC-USD", status="NEW")]
+
+    def get_positions(self):
+        return [FakeModel(market="BTC-USD", size=str(Decimal("0.5")))]
+
+
+def _setup(monkeypatch, state: FakeAccountState) -> list:
+    res = client.post("/accounts", json={**PARAMS, "api_key": "mirror-key"})
+    assert res.status_code == 200
+    upstream_calls = []
+
+    def fake_get_private(self, api_key, path, params=None):
+        upstream_calls.append((path, params))
+        return {"status": "OK", "data": "upstream"}
+
+    monkeypatch.setattr(account_mirror, "_ENABLED", True)
+    monkeypatch.setitem(account_mirror._mirrors, "mirror-key", state)
+    monkeypatch.setattr(proxy.ExtendedRESTClient, "get_private", fake_get_private)
+    return upstream_calls
+
+
+def test_loaded_mirror_answers_without_upstream(monkeypatch):
+    upstream_calls = _setup(monkeypatch, FakeAccountState(loaded=True))
+
+    assert client.get("/balances", params=PARAMS).json() == {"status": "OK", "data": {"collateralName": "USD", "balance": "1000"}}
+    assert client.get("/positions", params=PARAMS).json()["data"] == [{"market": "BTC-USD", "size": "0.5"}]
+    assert client.get("/orders", params=PARAMS).json()["data"] == [{"id": 1, "market": "BTC-USD", "status": "NEW"}]
+    assert upstream_calls == []
+
+    # Only the open orders are mirrored
+    assert client.get("/orders", params={**PARAMS, "status": "FILLED"}).json()["data"] == "upstream"
+    assert upstream_calls == [("/user/orders", {"status": "FILLED"})]
+
+
+def test_mirror_still_loading_falls_back_to_upstream(monkeypatch):
+    upstream_calls = _setup(monkeypatch, FakeAccountState(loaded=False))
+
+    assert client.get("/positions", params=PARAMS).json()["data"] == "upstream"
+    assert upstream_calls == [("/user/positions", None)]
+
+
+def test_idle_and_least_recently_read_mirrors_are_closed(monkeypatch):
+    monkeypatch.setattr(account_mirror, "_ENABLED", True)
+    monkeypatch.setattr(account_mirror, "_MAX_MIRRORS", 2)
+    monkeypatch.setattr(account_mirror, "_mirrors", account_mirror.OrderedDict())
+    monkeypatch.setattr(account_mirror, "_last_read", {})
+    monkeypatch.setattr(account_mirror, "_create_mirror", lambda api_key: FakeAccountState(loaded=True))
+
+    account_mirror.balance("key-a")
+    account_mirror.balance("key-b")
+    account_mirror.balance("key-a")
+    # At the cap: the least recently read mirror makes room
+    account_mirror.balance("key-c")
+    assert list(account_mirror._mirrors) == ["key-a", "key-c"]
+
+    monkeypatch.setattr(account_mirror, "_IDLE_SECONDS", 0)
+    assert account_mirror.evict_idle() == 2
+    assert not account_mirror._mirrors and not account_mirror._last_read
+
+
+def test_app_shutdown_closes_mirrors(monkeypatch):
+    closed = []
+    monkeypatch.setattr(account_mirror, "reset", lambda: closed.append(True))
+
+    with TestClient(app):
+        pass
+    assert closed == [True]
@@ -0,0 +1,73 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.services import candles, ticker
+from backend.app.services.order_signing import _get_env_config  # puts the vendored SDK on sys.path
+from x10.perpetual.candle_aggregator import CandleAggregator
+from x10.perpetual.stream_client.fast_decode import FastPublicTrade
+
+
+client = TestClient(app)
+
+MINUTE = 60_000
+START = 1_700_006_400_000
+
+
+def test_serves_current_candle_and_seeded_history(monkeypatch):
+    aggregator = CandleAggregator(_get_env_config(use_mainnet=False), markets=["BTC-USD"])
+    for i, (offset, price) in enumerate([(0, "100"), (1_000, "102"), (MINUTE, "101")]):
+        aggregator.on_trade(FastPublicTrade(i, "BTC-USD", "BUY", "TRADE", START + offset, Decimal(price), Decimal("1")))
+    upstream_calls = []
+
+    def fake_history(market, interval):
+        upstream_calls.append((market, interval))
+        return [{"o": "90", "h": "95", "l": "89", "c": "94", "v": "3", "T": START - MINUTE}]
+
+    monkeypatch.setattr(candles, "_ENABLED", True)
+    monkeypatch.setattr(candles, "_aggregator", aggregator)
+    monkeypatch.setattr(candles, "_fetch_upstream_history", fake_history)
+    monkeypatch.setattr(candles, "_seeded", set())
+    monkeypatch.setattr(ticker, "market_names", lambda: ["BTC-USD", "ETH-USD"])
+
+    data = client.get("/candles/BTC-USD", params={"interval": "PT1M", "limit": 5}).json()["data"]
+    assert data["current"] == {
+        "timestamp": START + MINUTE, "open": "101", "high": "101", "low": "101", "close": "101", "volume": "1"
+    }
+    assert [(c["timestamp"], c["close"]) for c in data["history"]] == [(START - MINUTE, "94"), (START, "102")]
+
+    # Seeded once per series
+    client.get("/candles/BTC-USD", params={"interval": "PT1M"})
+    assert upstream_calls == [("BTC-USD", "PT1M")]
+    assert client.get("/candles/BTC-USD", params={"interval": "PT3M"}).status_code == 422
+
+
+def test_unknown_market_and_failed_seed(monkeypatch):
+    aggregator = CandleAggregator(_get_env_config(use_mainnet=False))
+    upstream = [RuntimeError("upstream down"), [{"o": "90", "h": "95", "l": "89", "c": "94", "v": "3", "T": START}]]
+
+    def fake_history(market, interval):
+        result = upstream.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(candles, "_ENABLED", True)
+    monkeypatch.setattr(candles, "_aggregator", aggregator)
+    monkeypatch.setattr(candles, "_fetch_upstream_history", fake_history)
+    monkeypatch.setattr(candles, "_seeded", set())
+    monkeypatch.setattr(ticker, "market_names", lambda: ["BTC-USD"])
+
+    assert client.get("/candles/NOPE-USD").status_code == 404
+    assert aggregator.markets == []
+
+    # The failed seed is retried by the next request
+    assert client.get("/candles/BTC-USD").json()["data"]["history"] == []
+    history = client.get("/candles/BTC-USD").json()["data"]["history"]
+    assert [c["timestamp"] for c in history] == [START]
+    assert upstream == []
+
+
+def test_disabled_by_default():
+    assert client.get("/candles/BTC-USD").status_code == 404
@@ -0,0 +1,242 @@
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.services import history_store
+
+
+client = TestClient(app)
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def _register(wallet: str) -> None:
+    res = client.post("/accounts", json={"wallet_address": wallet, "account_index": 0, "api_key": "test-key"})
+    assert res.status_code == 200
+
+
+def _trade(trade_id: int, market: str, created_time: int, value: str, fee: str) -> dict:
+    return {
+        "id": trade_id,
+        "accountId": 1,
+        "market": market,
+        "orderId": trade_id * 10,
+        "side": "BUY",
+        "price": "100",
+        "qty": "1",
+        "value": value,
+        "fee": fee,
+        "isTaker": True,
+        "tradeType": "TRADE",
+        "createdTime": created_time,
+    }
+
+
+def _position(position_id: int, market: str, closed_time, trade_pnl: str, funding: str) -> dict:
+    return {
+        "id": position_id,
+        "accountId": 1,
+        "market": market,
+        "side": "LONG",
+        "size": "1",
+        "maxPositionSize": "1",
+        "leverage": "5",
+        "openPrice": "100",
+        "exitPrice": "110" if closed_time else None,
+        "realisedPnl": str(float(trade_pnl) + float(funding) - 0.2),
+        "realisedPnlBreakdown": {"tradePnl": trade_pnl, "fundingFees": funding, "openFees": "0.1", "closeFees": "0.1"},
+        "createdTime": 1,
+        "exitType": "TRADE" if closed_time else None,
+        "closedTime": closed_time,
+    }
+
+
+class FakeUpstream:
+    """
+    Serves the items newest first in pages with the last id as cursor, like the Extended history endpoints.
+    """
+
+    def __init__(self):
+        self.items = {history_store.TRADES_PATH: [], history_store.POSITIONS_HISTORY_PATH: []}
+        self.calls = []
+
+    def get_private(self, api_key, path, params=None):
+        self.calls.append((path, dict(params or {})))
+        items = sorted(self.items[path], key=lambda item: item["id"], reverse=True)
+        if "cursor" in params:
+            items = [item for item in items if item["id"] < params["cursor"]]
+        page = items[: params["limit"]]
+        cursor = page[-1]["id"] if page else None
+        return {"status": "OK", "data": page, "pagination": {"cursor": cursor, "count": len(page)}}
+
+
+def _install(monkeypatch, upstream: FakeUpstream) -> None:
+    monkeypatch.setattr(history_store, "_PAGE_LIMIT", 2)
+
+    def fake_get_private(self, api_key, path, params=None):
+        return upstream.get_private(api_key, path, params)
+
+    monkeypatch.setattr(history_store.ExtendedRESTClient, "get_private", fake_get_private)
+
+
+def test_pnl_is_aggregated_locally_per_window_and_market(monkeypatch):
+    wallet = "0xHistory0001"
+    _register(wallet)
+    upstream = FakeUpstream()
+    upstream.items[history_store.TRADES_PATH] = [
+        _trade(1, "BTC-USD", DAY_MS, "100", "0.05"),
+        _trade(2, "ETH-USD", DAY_MS + 10, "50", "0.02"),
+        _trade(3, "BTC-USD", 3 * DAY_MS, "200", "0.1"),
+    ]
+    upstream.items[history_store.POSITIONS_HISTORY_PATH] = [
+        _position(11, "BTC-USD", DAY_MS + 5, "10", "-1"),
+        _position(12, "ETH-USD", 2 * DAY_MS, "-4", "0.5"),
+        _position(13, "BTC-USD", None, "0", "0"),
+    ]
+    _install(monkeypatch, upstream)
+
+    res = client.get("/history/pnl", params={"wallet_address": wallet, "account_index": 0})
+    assert res.status_code == 200
+    body = res.json()
+    assert body["total"]["positions_closed"] == 2
+    assert body["total"]["trade_pnl"] == "6"
+    assert body["total"]["funding_fees"] == "-0.5"
+    assert body["total"]["open_fees"] == "0.2"
+    assert body["total"]["trading_fees"] == "0.17"
+    assert body["total"]["volume"] == "350"
+    assert body["markets"]["ETH-USD"]["realised_pnl"] == "-3.7"
+
+    # Further queries do not go upstream
+    calls = len(upstream.calls)
+    res = client.get(
+        "/history/pnl",
+        params={"wallet_address": wallet, "account_index": 0, "market": "BTC-USD", "end_time": 2 * DAY_MS},
+    )
+    assert len(upstream.calls) == calls
+    body = res.json()
+    assert list(body["markets"]) == ["BTC-USD"]
+    assert body["total"] == {
+        "positions_closed": 1,
+        "realised_pnl": "8.8",
+        "trade_pnl": "10",
+        "funding_fees": "-1",
+        "open_fees": "0.1",
+        "close_fees": "0.1",
+        "trades": 1,
+        "trading_fees": "0.05",
+        "volume": "100",
+    }
+
+    series = client.get(
+        "/history/pnl/series",
+        params={"wallet_address": wallet, "account_index": 0, "start_time": DAY_MS, "end_time": 3 * DAY_MS - 1},
+    ).json()
+    assert [bucket["positions_closed"] for bucket in series] == [1, 1]
+    assert [bucket["trade_pnl"] for bucket in series] == ["10", "-4"]
+
+
+def test_sync_only_fetches_new_items(monkeypatch):
+    wallet = "0xHistory0002"
+    _register(wallet)
+    upstream = FakeUpstream()
+    upstream.items[history_store.TRADES_PATH] = [_trade(i, "BTC-USD", i * 1000, "10", "0.01") for i in range(1, 6)]
+    _install(monkeypatch, upstream)
+
+    first = client.post("/history/sync", json={"wallet_address": wallet, "account_index": 0}).json()
+    assert first["trades"] == {"added": 5, "pages": 3, "complete": True}
+
+    upstream.items[history_store.TRADES_PATH].append(_trade(6, "BTC-USD", 6000, "10", "0.01"))
+    second = client.post("/history/sync", json={"wallet_address": wallet, "account_index": 0}).json()
+    assert second["trades"] == {"added": 1, "pages": 1, "complete": True}
+
+    trades = client.get("/history/trades", params={"wallet_address": wallet, "account_index": 0, "limit": 3}).json()
+    assert [trade["id"] for trade in trades] == [6, 5, 4]
+    assert trades[0]["side"] == "BUY" and trades[0]["is_taker"] is True
+
+
+def test_interrupted_backfill_resumes_from_its_cursor(monkeypatch):
+    wallet = "0xHistory0003"
+    _register(wallet)
+    upstream = FakeUpstream()
+    upstream.items[history_store.TRADES_PATH] = [_trade(i, "BTC-USD", i * 1000, "10", "0.01") for i in range(1, 8)]
+    _install(monkeypatch, upstream)
+    monkeypatch.setattr(history_store, "_MAX_PAGES_PER_SYNC", 3)
+
+    first = client.post("/history/sync", json={"wallet_address": wallet, "account_index": 0}).json()
+    assert first["trades"] == {"added": 6, "pages": 3, "complete": False}
+
+    upstream.items[history_store.TRADES_PATH].append(_trade(8, "BTC-USD", 8000, "10", "0.01"))
+    second = client.post("/history/sync", json={"wallet_address": wallet, "account_index": 0}).json()
+    # One page up to the known trades, then the rest of the backfill
+    assert second["trades"] == {"added": 2, "pages": 2, "complete": True}
+
+    trades = client.get("/history/trades", params={"wallet_address": wallet, "account_index": 0}).json()
+    assert [trade["id"] for trade in trades] == list(range(8, 0, -1))
+
+
+def test_sync_picks_up_position_closed_after_earlier_sync(monkeypatch):
+    wallet = "0xHistory0004"
+    _register(wallet)
+    upstream = FakeUpstream()
+    positions = upstream.items[history_store.POSITIONS_HISTORY_PATH]
+    positions.extend(_position(i, "BTC-USD", None if i == 2 else i * 1000, "1", "0") for i in range(1, 6))
+    _install(monkeypatch, upstream)
+
+    first = client.post("/history/sync", json={"wallet_address": wallet, "account_index": 0}).json()
+    assert first["positions"]["added"] == 4
+
+    # Opened before the first sync, closed after it: older than the known newest positions
+    positions[1] = _position(2, "BTC-USD", 7000, "1", "0")
+    positions.append(_position(6, "BTC-USD", 6000, "1", "0"))
+    second = client.post("/history/sync", json={"wallet_address": wallet, "account_index": 0}).json()
+    assert second["positions"] == {"added": 2, "pages": 3, "complete": True}
+
+    closed = client.get("/history/positions", params={"wallet_address": wallet, "account_index": 0}).json()
+    assert [position["id"] for position in closed] == [2, 6, 5, 4, 3, 1]
+
+
+def test_stale_history_is_refreshed_on_read(monkeypatch):
+    wallet = "0xHistory0005"
+    _register(wallet)
+    upstream = FakeUpstream()
+    upstream.items[history_store.TRADES_PATH] = [_trade(1, "BTC-USD", 1000, "10", "0.01")]
+    _install(monkeypatch, upstream)
+    params = {"wallet_address": wallet, "account_index": 0}
+
+    assert [trade["id"] for trade in client.get("/history/trades", params=params).json()] == [1]
+    upstream.items[history_store.TRADES_PATH].append(_trade(2, "BTC-USD", 2000, "10", "0.01"))
+    # Fresh: answered locally
+    assert [trade["id"] for trade in client.get("/history/trades", params=params).json()] == [1]
+
+    monkeypatch.setattr(history_store, "_REFRESH_SECONDS", 0)
+    assert [trade["id"] for trade in client.get("/history/trades", params=params).json()] == [2, 1]
+
+
+def test_least_recently_used_accounts_are_evicted(monkeypatch):
+    monkeypatch.setattr(history_store, "_MAX_ACCOUNTS", 2)
+    history_store.reset()
+    first = history_store._history("0xA", 0)
+    history_store._history("0xB", 0)
+    assert history_store._history("0xA", 0) is first
+    history_store._history("0xC", 0)
+    assert list(history_store._accounts) == [("0xa", 0), ("0xc", 0)]
+    assert history_store.needs_sync("0xB", 0)
+
+
+def test_reads_are_not_blocked_by_upstream_requests_of_a_sync(monkeypatch):
+    wallet = "0xHistory0006"
+    _register(wallet)
+    upstream = FakeUpstream()
+    upstream.items[history_store.TRADES_PATH] = [_trade(1, "BTC-USD", 1000, "10", "0.01")]
+    _install(monkeypatch, upstream)
+    history_store.sync_account(wallet, 0, "test-key")
+    reads = []
+
+    def slow_get_private(self, api_key, path, params=None):
+        # A reader gets the stored rows while this request is in flight
+        reads.append(history_store.query("trades", wallet, 0))
+        return upstream.get_private(api_key, path, params)
+
+    monkeypatch.setattr(history_store.ExtendedRESTClient, "get_private", slow_get_private)
+    history_store.sync_account(wallet, 0, "test-key")
+    assert [[trade["id"] for trade in rows] for rows in reads][0] == [1]
+    assert reads[0][0]["value"] == "10"
@@ -0,0 +1,200 @@
+import httpx
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routes import orders
+from backend.app.services import order_signing
+
+
+client = TestClient(app)
+
+
+def _register(wallet: str, **credentials) -> None:
+    res = client.post(
+        "/accounts", json={"wallet_address": wallet, "account_index": 0, "api_key": "test-key", **credentials}
+    )
+    assert res.status_code == 200
+
+
+def _register_signer(wallet: str, monkeypatch) -> None:
+    _register(wallet, stark_private_key="0x1", stark_public_key="0x2", vault=7)
+    monkeypatch.setattr(order_signing, "build_signed_limit_order_json", lambda **kwargs: {"id": "ext-limit"})
+    monkeypatch.setattr(order_signing, "build_signed_tpsl_position_order_json", lambda **kwargs: {"id": "ext-tpsl"})
+
+
+def test_retry_with_same_key_replays_original_response(monkeypatch):
+    wallet = "0xIdem0001"
+    _register(wallet)
+    calls = []
+
+    def fake_post_private(self, api_key, path, json):
+        calls.append(json)
+        return {"status": "OK", "data": {"id": len(calls), "externalId": json["id"]}}
+
+    monkeypatch.setattr(orders.ExtendedRESTClient, "post_private", fake_post_private)
+    body = {"wallet_address": wallet, "account_index": 0, "order": {"id": "abc"}}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/orders", json=body, headers=headers)
+    second = client.post("/orders", json=body, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(calls) == 1
+
+    # Without the header every request goes upstream
+    client.post("/orders", json=body)
+    assert len(calls) == 2
+
+
+def test_reusing_key_with_different_body_is_rejected(monkeypatch):
+    wallet = "0xIdem0002"
+    _register(wallet)
+    monkeypatch.setattr(
+        orders.ExtendedRESTClient, "post_private", lambda self, api_key, path, json: {"status": "OK", "data": {}}
+    )
+    headers = {"Idempotency-Key": "retry-2"}
+
+    client.post("/orders", json={"wallet_address": wallet, "account_index": 0, "order": {"id": "a"}}, headers=headers)
+    res = client.post(
+        "/orders", json={"wallet_address": wallet, "account_index": 0, "order": {"id": "b"}}, headers=headers
+    )
+    assert res.status_code == 422
+
+
+def test_timeout_after_send_keeps_key_with_unknown_outcome(monkeypatch):
+    wallet = "0xIdem0003"
+    _register(wallet)
+    calls = []
+
+    def fake_post_private(self, api_key, path, json):
+        calls.append(json)
+        raise httpx.ReadTimeout("timed out", request=httpx.Request("POST", "https://upstream/user/order"))
+
+    monkeypatch.setattr(orders.ExtendedRESTClient, "post_private", fake_post_private)
+    body = {"wallet_address": wallet, "account_index": 0, "order": {"id": "ext-3"}}
+    headers = {"Idempotency-Key": "retry-3"}
+
+    first = client.post("/orders", json=body, headers=headers)
+    second = client.post("/orders", json=body, headers=headers)
+
+    assert first.status_code == second.status_code == 502
+    assert first.json() == second.json()
+    assert first.json()["detail"]["external_id"] == "ext-3"
+    # The order may have been placed, the retry must not send it again
+    assert len(calls) == 1
+
+
+def test_failure_before_send_releases_key(monkeypatch):
+    wallet = "0xIdem0004"
+    _register(wallet)
+    calls = []
+
+    def fake_post_private(self, api_key, path, json):
+        calls.append(json)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused", request=httpx.Request("POST", "https://upstream/user/order"))
+        return {"status": "OK", "data": {"id": 1}}
+
+    monkeypatch.setattr(orders.ExtendedRESTClient, "post_private", fake_post_private)
+    body = {"wallet_address": wallet, "account_index": 0, "order": {"id": "ext-4"}}
+    headers = {"Idempotency-Key": "retry-4"}
+
+    assert client.post("/orders", json=body, headers=headers).status_code == 502
+    assert client.post("/orders", json=body, headers=headers).status_code == 200
+    assert len(calls) == 2
+
+
+def test_create_and_place_timeout_is_not_placed_again(monkeypatch):
+    wallet = "0xIdem0005"
+    _register_signer(wallet, monkeypatch)
+    calls = []
+
+    def fake_post_private(self, api_key, path, json):
+        calls.append(json)
+        raise httpx.RemoteProtocolError("connection reset")
+
+    monkeypatch.setattr(orders.ExtendedRESTClient, "post_private", fake_post_private)
+    body = {"wallet_address": wallet, "account_index": 0, "market": "BTC-USD", "qty": 0.01, "price": 50000, "side": "BUY"}
+    headers = {"Idempotency-Key": "retry-5"}
+
+    first = client.post("/orders/create-and-place", json=body, headers=headers)
+    second = client.post("/orders/create-and-place", json=body, headers=headers)
+
+    assert first.status_code == second.status_code == 502
+    assert second.json()["detail"]["external_id"] == "ext-limit"
+    assert len(calls) == 1
+
+
+def test_add_tpsl_upstream_errors(monkeypatch):
+    wallet = "0xIdem0006"
+    _register_signer(wallet, monkeypatch)
+    statuses = [503, 400]
+    calls = []
+
+    def fake_post_private(self, api_key, path, json):
+        calls.append(json)
+        request = httpx.Request("POST", "https://upstream/user/order")
+        response = httpx.Response(statuses.pop(), json={"error": "upstream"}, request=request)
+        raise httpx.HTTPStatusError("error", request=request, response=response)
+
+    monkeypatch.setattr(orders.ExtendedRESTClient, "post_private", fake_post_private)
+    body = {"wallet_address": wallet, "account_index": 0, "market": "BTC-USD", "qty": 0.01, "side": "SELL"}
+
+    # A rejection is stored and replayed
+    rejected = {**body, "take_profit_trigger_price": 60000}
+    assert client.post("/orders/add-tpsl", json=rejected, headers={"Idempotency-Key": "tpsl-1"}).status_code == 400
+    assert client.post("/orders/add-tpsl", json=rejected, headers={"Idempotency-Key": "tpsl-1"}).status_code == 400
+    # So is an upstream server error, the order may exist
+    failed = {**body, "stop_loss_trigger_price": 40000}
+    assert client.post("/orders/add-tpsl", json=failed, headers={"Idempotency-Key": "tpsl-2"}).status_code == 502
+    res = client.post("/orders/add-tpsl", json=failed, headers={"Idempotency-Key": "tpsl-2"})
+    assert res.status_code == 502
+    assert res.json()["detail"]["upstream_status"] == 503
+    assert len(calls) == 2
+
+
+def test_error_before_send_releases_key_for_retry_after_onboarding(monkeypatch):
+    wallet = "0xIdem0007"
+    monkeypatch.setattr(
+        orders.ExtendedRESTClient, "post_private", lambda self, api_key, path, json: {"status": "OK", "data": {}}
+    )
+    body = {"wallet_address": wallet, "account_index": 0, "order": {"id": "onboard"}}
+    headers = {"Idempotency-Key": "retry-7"}
+
+    # No API key yet: nothing was sent, the 401 is not replayed
+    assert client.post("/orders", json=body, headers=headers).status_code == 401
+    _register(wallet)
+    assert client.post("/orders", json=body, headers=headers).status_code == 200
+
+
+def test_in_flight_lease_is_renewed_while_handler_runs(monkeypatch):
+    import time
+
+    from backend.app.services import idempotency
+    from backend.app.storage import STORE
+
+    monkeypatch.setattr(idempotency, "_IN_FLIGHT_LEASE_SECONDS", 0.15)
+    claims = []
+
+    def slow_handler():
+        time.sleep(0.5)
+        # Past the initial lease, another request still finds the claim
+        claims.append(STORE.claim_idempotency_key("lease:slow", idempotency._fingerprint({}), 0.15))
+        return {"ok": True}
+
+    assert idempotency.run_idempotent("lease", "slow", {}, slow_handler) == {"ok": True}
+    assert claims[0] is not None and claims[0].status_code is None
+
+
+def test_memory_store_evicts_only_completed_records():
+    from backend.app.storage.memory import MemoryStore
+
+    store = MemoryStore()
+    store.MAX_IDEMPOTENCY_RECORDS = 2
+    assert store.claim_idempotency_key("in-flight", "fp", 60) is None
+    assert store.claim_idempotency_key("done", "fp", 60) is None
+    store.complete_idempotency_key("done", 200, {}, 60)
+    assert store.claim_idempotency_key("new", "fp", 60) is None
+    assert store.get_idempotency_record("in-flight") is not None
+    assert store.get_idempotency_record("done") is None
@@ -0,0 +1,85 @@
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routes import orders
+from backend.app.services import order_journal, order_signing
+
+
+client = TestClient(app)
+
+ACCOUNT = {"wallet_address": "0xJournal", "account_index": 0}
+ORDER = {**ACCOUNT, "market": "BTC-USD", "qty": 0.01, "price": 50000, "side": "BUY"}
+
+
+def _setup(monkeypatch, post_private) -> None:
+    res = client.post(
+        "/accounts",
+        json={**ACCOUNT, "api_key": "journal-key", "stark_private_key": "0x1", "stark_public_key": "0x2", "vault": 7},
+    )
+    assert res.status_code == 200
+    monkeypatch.setattr(
+        order_signing, "build_signed_limit_order_json", lambda **kwargs: {"id": "ext-1", "market": kwargs["market"]}
+    )
+    monkeypatch.setattr(orders.ExtendedRESTClient, "post_private", post_private)
+
+
+def test_placed_and_rejected_orders_are_journaled(monkeypatch):
+    responses = [{"status": "OK", "data": {"id": 11, "status": "NEW"}}]
+
+    def post_private(self, api_key, path, json):
+        if not responses:
+            request = httpx.Request("POST", "https://upstream/user/order")
+            response = httpx.Response(400, json={"error": "Invalid price"}, request=request)
+            raise httpx.HTTPStatusError("bad request", request=request, response=response)
+        return responses.pop()
+
+    _setup(monkeypatch, post_private)
+
+    assert client.post("/orders/create-and-place", json=ORDER).json()["data"]["id"] == 11
+    assert client.post("/orders/create-and-place", json=ORDER).status_code == 400
+    assert order_journal.flush()
+
+    entries = client.get("/orders/journal", params={**ACCOUNT, "limit": 2}).json()["data"]
+    assert [(e["status"], e["http_status"]) for e in entries] == [("ERROR", 400), ("NEW", 200)]
+    assert entries[0]["response"] == {"error": "Invalid price"}
+    assert entries[1]["body_hash"] == order_journal.body_hash({"id": "ext-1", "market": "BTC-USD"})
+    assert entries[1]["external_id"] == "ext-1"
+    assert entries[1]["request"]["price"] == 50000
+    assert set(entries[1]["timings_ms"]) == {"sign", "upstream"}
+    # Flushed to the store as well
+    assert [e["id"] for e in order_journal.STORE.recent_order_journal("0xjournal", 0, 2)] == [e["id"] for e in entries]
+
+
+def test_segmented_file_rotates_and_keeps_newest_segments(tmp_path):
+    journal = order_journal._SegmentedFile(str(tmp_path), segment_bytes=200, segments_kept=3)
+    for i in range(10):
+        journal.append_order_journal([{"id": str(i), "padding": "x" * 150}])
+
+    segments = sorted(path.name for path in tmp_path.iterdir())
+    assert len(segments) == 3
+    lines = [json.loads(line) for name in segments for line in (tmp_path / name).read_text().splitlines()]
+    # Two entries fill a segment
+    assert [entry["id"] for entry in lines] == ["4", "5", "6", "7", "8", "9"]
+
+
+def test_rotation_keeps_segments_of_running_workers(tmp_path, monkeypatch):
+    other = order_journal._SegmentedFile(str(tmp_path), segment_bytes=200, segments_kept=1)
+    other.append_order_journal([{"id": "other"}])
+    # A worker that exited left two segments behind
+    (tmp_path / "orders-1-999999999-000001.jsonl").write_text("{}\n")
+    (tmp_path / "orders-1-999999999-000002.jsonl").write_text("{}\n")
+    monkeypatch.setattr(order_journal, "_pid_alive", lambda pid: pid != 999999999)
+
+    journal = order_journal._SegmentedFile(str(tmp_path), segment_bytes=200, segments_kept=1)
+    # Same pid as `other` in this test: a distinct start time keeps the prefixes apart
+    journal._prefix = other._prefix.replace("orders-", "orders-9", 1)
+    for i in range(4):
+        journal.append_order_journal([{"id": str(i), "padding": "x" * 150}])
+
+    segments = sorted(path.name for path in tmp_path.iterdir())
+    assert [name for name in segments if name.startswith(other._prefix + "-")] == [other._prefix + "-000001.jsonl"]
+    assert [name for name in segments if name.startswith(journal._prefix + "-")] == [journal._prefix + "-000002.jsonl"]
+    assert [name for name in segments if "-999999999-" in name] == ["orders-1-999999999-000002.jsonl"]
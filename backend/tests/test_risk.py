@@ -0,0 +1,140 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routes import risk
+from backend.app.services import account_mirror, risk_engine
+from backend.app.services.risk_engine import RiskEngine
+
+
+client = TestClient(app)
+
+PARAMS = {"wallet_address": "0xRisk", "account_index": 0}
+
+
+def _engine() -> RiskEngine:
+    engine = RiskEngine()
+    # 2% up to 1000 notional, 5% up to 2000, the whole notional above
+    engine.set_market("BTC-USD", [2000, 1000], [0.05, 0.02])
+    engine.set_market("ETH-USD", [10_000], [0.1])
+    return engine
+
+
+def test_risk_tier_is_first_upper_bound_at_or_above_notional():
+    engine = _engine()
+    engine.set_account(("a", 0), 10_000, [("BTC-USD", 1, 1000), ("BTC-USD", -1, 1000)])
+    for mark, factor in [(1000, 0.02), (1000.5, 0.05), (2000, 0.05), (2001, 1.0)]:
+        engine.update_marks({"BTC-USD": mark})
+        positions = engine.evaluate().account(("a", 0))["positions"]
+        assert [p["risk_factor"] for p in positions] == [factor, factor]
+
+
+def test_liquidation_price_of_long_and_short():
+    engine = _engine()
+    engine.set_account(("long", 0), 100, [("ETH-USD", 2, 1000)])
+    engine.set_account(("short", 0), 300, [("ETH-USD", -2, 1000)])
+    engine.update_marks({"ETH-USD": 1000})
+    snapshot = engine.evaluate()
+
+    long = snapshot.account(("long", 0))
+    assert long["equity"] == 100
+    assert long["margin_requirement"] == pytest.approx(200)
+    assert long["margin_usage"] == pytest.approx(2)
+    # Already under water
+    assert long["positions"][0]["liquidation_distance"] == 0
+
+    engine.set_account(("long", 0), 400, [("ETH-USD", 2, 1000)])
+    snapshot = engine.evaluate()
+    long, short = snapshot.account(("long", 0))["positions"][0], snapshot.account(("short", 0))["positions"][0]
+    # 400 + 2 * (p - 1000) == 0.1 * 2 * p
+    assert long["liquidation_price"] == pytest.approx(1600 / 1.8)
+    # 300 - 2 * (p - 1000) == 0.1 * 2 * p
+    assert short["side"] == "SHORT"
+    assert short["liquidation_price"] == pytest.approx(2300 / 2.2)
+    assert short["liquidation_distance"] == pytest.approx(2300 / 2.2 / 1000 - 1)
+    assert [(a["wallet_address"], a["market"]) for a in snapshot.at_risk(0.1)] == [("short", "ETH-USD")]
+    assert [a["wallet_address"] for a in snapshot.at_risk(0.2)] == ["short", "long"]
+
+
+def test_single_account_is_evaluated_without_global_rebuild():
+    engine = _engine()
+    engine.set_account(("a", 0), 400, [("ETH-USD", 2, 1000)])
+    engine.set_account(("b", 0), 300, [("ETH-USD", -2, 1000)])
+    engine.update_marks({"ETH-USD": 1000})
+    engine.evaluate()
+    arrays = engine._arrays
+
+    # Unchanged positions keep the global arrays
+    engine.set_account(("a", 0), 400, [("ETH-USD", 2, 1000)])
+    assert engine._arrays is arrays
+    engine.set_account(("a", 0), 500, [("ETH-USD", 2, 1000)])
+    assert engine._arrays is None
+
+    snapshot = engine.evaluate_account(("b", 0))
+    assert engine._arrays is None
+    assert snapshot.accounts == [("b", 0)]
+    assert snapshot.account(("b", 0)) == engine.evaluate().account(("b", 0))
+    assert engine.evaluate_account(("c", 0)).account(("c", 0)) is None
+
+
+def test_unknown_market_is_rejected():
+    with pytest.raises(KeyError):
+        _engine().set_account(("a", 0), 100, [("SOL-USD", 1, 100)])
+
+
+def test_risk_route_uses_account_positions_and_market_tiers(monkeypatch):
+    res = client.post("/accounts", json={**PARAMS, "api_key": "risk-key"})
+    assert res.status_code == 200
+    engine = _engine()
+    upstream = {
+        "/user/positions": [
+            {"market": "ETH-USD", "side": "SHORT", "size": "2", "openPrice": "1000", "markPrice": "1000"}
+        ],
+        "/user/balance": {"collateralName": "USD", "balance": "300"},
+    }
+
+    def fake_get_private(self, api_key, path, params=None):
+        assert api_key == "risk-key"
+        return {"status": "OK", "data": upstream[path]}
+
+    monkeypatch.setattr(risk_engine, "ENGINE", engine)
+    monkeypatch.setattr(risk_engine, "_tracked", {})
+    monkeypatch.setattr(risk.ExtendedRESTClient, "get_private", fake_get_private)
+
+    data = client.get("/risk", params=PARAMS).json()["data"]
+    assert data["equity"] == 300
+    assert data["positions"][0]["liquidation_price"] == pytest.approx(2300 / 2.2)
+
+    alerts = client.get("/risk/alerts", params={**PARAMS, "max_distance": 0.1}).json()["data"]
+    assert [(a["wallet_address"], a["side"]) for a in alerts] == [("0xrisk", "SHORT")]
+    assert client.get("/risk/alerts", params={**PARAMS, "market": "BTC-USD"}).json()["data"] == []
+    # Scoped to the caller's registered account
+    assert client.get("/risk/alerts", params={"wallet_address": "0xOther", "account_index": 0}).status_code == 401
+
+
+def test_refresh_takes_positions_from_the_mirror_and_drops_stale_and_idle_accounts(monkeypatch):
+    engine = _engine()
+    monkeypatch.setattr(risk_engine, "ENGINE", engine)
+    monkeypatch.setattr(risk_engine, "_tracked", {})
+    short = {"market": "ETH-USD", "side": "SHORT", "size": "2", "openPrice": "1000", "markPrice": "1000"}
+    risk_engine.load_account(("mirrored", 0), "key-m", 300, [short])
+    risk_engine.load_account(("unmirrored", 0), "key-u", 300, [short])
+    risk_engine.load_account(("idle", 0), "key-i", 300, [short])
+    mirrors = {"key-m": ([], {"balance": "500"}), "key-i": ([short], {"balance": "300"})}
+    monkeypatch.setattr(account_mirror, "positions", lambda api_key: mirrors.get(api_key, (None, None))[0])
+    monkeypatch.setattr(account_mirror, "balance", lambda api_key: mirrors.get(api_key, (None, None))[1])
+
+    risk_engine._refresh_accounts()
+    # The position closed since the request is gone
+    assert engine.evaluate().account(("mirrored", 0)) == {
+        "equity": 500, "exposure": 0, "margin_requirement": 0, "margin_usage": 0, "positions": []
+    }
+    assert engine.evaluate().account(("unmirrored", 0)) is not None
+
+    monkeypatch.setattr(risk_engine, "_ACCOUNT_TTL_SECONDS", 0)
+    risk_engine._tracked[("idle", 0)] = ("key-i", 0)
+    monkeypatch.setattr(risk_engine, "_ACCOUNT_IDLE_SECONDS", 1)
+    risk_engine._refresh_accounts()
+    # Still refreshed from its mirror; the other one is too old, the third was not requested for too long
+    assert engine.evaluate().accounts == [("mirrored", 0)]
+    assert list(risk_engine._tracked) == [("mirrored", 0)]
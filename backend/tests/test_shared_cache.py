@@ -0,0 +1,77 @@
+from backend.app.storage.shared_cache import SharedTTLCache
+
+
+def test_workers_share_published_entries(tmp_path):
+    # Two instances over the same directory behave like two uvicorn workers.
+    worker_a = SharedTTLCache("markets", ttl_seconds=60, directory=str(tmp_path))
+    worker_b = SharedTTLCache("markets", ttl_seconds=60, directory=str(tmp_path))
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {"name": "BTC-USD"}
+
+    assert worker_a.get_or_load("BTC-USD", loader)["v"] == {"name": "BTC-USD"}
+    assert worker_b.get_or_load("BTC-USD", loader)["v"] == {"name": "BTC-USD"}
+    assert len(calls) == 1
+
+    # One file per key: setting a key leaves the others alone
+    worker_b.set("ETH-USD", {"name": "ETH-USD"})
+    assert worker_a.get("ETH-USD") == {"name": "ETH-USD"}
+    assert worker_a.get("BTC-USD") == {"name": "BTC-USD"}
+
+    worker_b.delete("BTC-USD")
+    assert worker_a.get("BTC-USD") is None
+
+
+def test_cache_directory_is_private(tmp_path):
+    cache = SharedTTLCache("ctx", ttl_seconds=60, directory=str(tmp_path))
+    cache.set("0xabc:0", {"api_key": "k"})
+    entry_dir = tmp_path / "ctx"
+    assert entry_dir.stat().st_mode & 0o777 == 0o700
+    assert all(path.stat().st_mode & 0o077 == 0 for path in entry_dir.iterdir())
+
+
+def test_load_of_one_key_does_not_block_other_keys(tmp_path):
+    worker_a = SharedTTLCache("markets", ttl_seconds=60, directory=str(tmp_path))
+    worker_b = SharedTTLCache("markets", ttl_seconds=60, directory=str(tmp_path), load_wait_seconds=0.2)
+    loaded = []
+
+    def slow_loader():
+        # Other keys load while this one holds its lock; the same key gives up waiting and loads itself
+        loaded.append(worker_b.get_or_load("ETH-USD", lambda: "eth")["v"])
+        loaded.append(worker_b.get_or_load("BTC-USD", lambda: "btc-b")["v"])
+        return "btc-a"
+
+    assert worker_a.get_or_load("BTC-USD", slow_loader)["v"] == "btc-a"
+    assert loaded == ["eth", "btc-b"]
+
+
+def test_expired_entries_are_reloaded(tmp_path):
+    cache = SharedTTLCache("ctx", ttl_seconds=-1, directory=str(tmp_path))
+    cache.set("0xabc:0", {"api_key": "k"})
+    assert cache.get("0xabc:0") is None
+
+
+def test_trading_context_loads_each_user_once_and_skips_missing_users(monkeypatch, tmp_path):
+    from backend.app.services import trading_context
+    from backend.app.storage.memory import UserRecord
+
+    monkeypatch.setattr(
+        trading_context, "_CONTEXT_CACHE", SharedTTLCache("ctx", ttl_seconds=60, directory=str(tmp_path))
+    )
+    lookups = []
+    users = {}
+
+    def get_user(wallet_address, account_index):
+        lookups.append((wallet_address, account_index))
+        return users.get((wallet_address, account_index))
+
+    monkeypatch.setattr(trading_context.STORE, "get_user", get_user)
+
+    # An unknown user is not cached, so onboarding shows up on the next request
+    assert trading_context.get_trading_context("0xABC", 0) is None
+    users[("0xABC", 0)] = UserRecord(wallet_address="0xabc", account_index=0, api_key="k", vault=7)
+    assert trading_context.get_trading_context("0xABC", 0).api_key == "k"
+    assert trading_context.get_trading_context("0xabc", 0).vault == 7
+    assert len(lookups) == 2
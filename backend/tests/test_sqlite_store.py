@@ -0,0 +1,77 @@
+import threading
+
+from backend.app.storage.sqlite import SQLiteStore
+
+
+def test_users_and_nonces_persist_across_reopen(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = SQLiteStore(path)
+    store.upsert_user("0xABC", 0, api_key="key-1", vault=7)
+    # None keeps the stored value
+    record = store.upsert_user("0xabc", 0, stark_public_key="0xpub")
+    assert (record.wallet_address, record.api_key, record.stark_public_key, record.vault) == ("0xabc", "key-1", "0xpub", 7)
+    nonce = store.create_session_nonce("0xABC")
+
+    reopened = SQLiteStore(path)
+    assert reopened.get_user("0xAbC", 0).api_key == "key-1"
+    assert reopened.get_user("0xabc", 1) is None
+    assert reopened.consume_session_nonce("0xabc", "wrong") is False
+    assert reopened.consume_session_nonce("0xabc", nonce) is True
+    assert reopened.consume_session_nonce("0xabc", nonce) is False
+
+    expired = store.create_session_nonce("0xdef", ttl_seconds=-1)
+    assert store.consume_session_nonce("0xdef", expired) is False
+
+
+def test_idempotency_key_lifecycle(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.db"))
+    assert store.claim_idempotency_key("k", "fp", lease_seconds=30) is None
+    in_flight = store.claim_idempotency_key("k", "other", lease_seconds=30)
+    assert (in_flight.fingerprint, in_flight.status_code) == ("fp", None)
+
+    store.complete_idempotency_key("k", 200, {"id": 1}, ttl_seconds=60)
+    done = store.get_idempotency_record("k")
+    assert (done.status_code, done.response) == (200, {"id": 1})
+
+    store.release_idempotency_key("k")
+    assert store.get_idempotency_record("k") is None
+    # An expired holder is taken over
+    assert store.claim_idempotency_key("e", "fp", lease_seconds=-1) is None
+    assert store.claim_idempotency_key("e", "fp2", lease_seconds=30) is None
+    assert store.get_idempotency_record("e").fingerprint == "fp2"
+
+    # Renewing extends an in-flight lease only
+    assert store.claim_idempotency_key("r", "fp", lease_seconds=-1) is None
+    store.renew_idempotency_key("r", 30)
+    assert store.get_idempotency_record("r").status_code is None
+    store.complete_idempotency_key("r", 200, {}, ttl_seconds=-1)
+    store.renew_idempotency_key("r", 30)
+    assert store.get_idempotency_record("r") is None
+
+
+def test_threads_use_their_own_connections(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.db"))
+    claimed = []
+
+    def worker(index: int) -> None:
+        for i in range(50):
+            store.upsert_user(f"0x{index}", i, api_key=f"key-{index}-{i}")
+        if store.claim_idempotency_key("shared", f"fp-{index}", lease_seconds=30) is None:
+            claimed.append(index)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == 1
+    assert store.get_user("0x3", 49).api_key == "key-3-49"
+
+
+def test_order_journal_batches_and_recent_entries(tmp_path):
+    store = SQLiteStore(str(tmp_path / "store.db"))
+    store.append_order_journal(
+        [{"id": str(i), "wallet_address": "0xABC", "account_index": i % 2, "ts": i, "status": "NEW"} for i in range(6)]
+    )
+    assert [entry["id"] for entry in store.recent_order_journal("0xabc", 0, 2)] == ["4", "2"]
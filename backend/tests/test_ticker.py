@@ -0,0 +1,65 @@
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.services import ticker
+from backend.app.storage.shared_cache import SharedSnapshot
+
+
+client = TestClient(app)
+
+
+def _stats(last_price, funding="0.0001"):
+    return [last_price, last_price, last_price, "1", "0.01", "1000", funding, "50"]
+
+
+def _setup(monkeypatch, tmp_path, upstream):
+    monkeypatch.setattr(ticker, "_snapshot", SharedSnapshot("ticker", str(tmp_path)))
+    monkeypatch.setattr(ticker, "_REFRESH_SECONDS", 0)
+    monkeypatch.setattr(ticker, "_fetch_market_stats", lambda: upstream.pop(0))
+
+
+def test_snapshot_etag_and_deltas(monkeypatch, tmp_path):
+    upstream = [
+        {"BTC-USD": _stats("100"), "ETH-USD": _stats("10")},
+        {"BTC-USD": _stats("100"), "ETH-USD": _stats("10")},
+        {"BTC-USD": _stats("101"), "ETH-USD": _stats("10", funding="0.0002"), "SOL-USD": _stats("1")},
+        {"BTC-USD": _stats("101"), "SOL-USD": _stats("1")},
+    ]
+    _setup(monkeypatch, tmp_path, upstream)
+
+    res = client.get("/ticker")
+    first = res.json()
+    assert first["fields"][0] == "lastPrice" and first["full"] is True
+    assert first["markets"]["BTC-USD"] == _stats("100")
+    assert res.headers["etag"] == f'"{first["version"]}"'
+
+    # Nothing changed upstream: same version, not modified
+    res = client.get("/ticker", headers={"If-None-Match": res.headers["etag"]})
+    assert res.status_code == 304
+
+    delta = client.get("/ticker/delta", params={"since": first["version"]}).json()
+    assert delta["full"] is False
+    assert delta["changed"] == {
+        "BTC-USD": {"lastPrice": "101", "markPrice": "101", "indexPrice": "101"},
+        "ETH-USD": {"fundingRate": "0.0002"},
+        "SOL-USD": dict(zip(ticker.FIELDS, _stats("1"))),
+    }
+    second = delta["version"]
+
+    delta = client.get("/ticker/delta", params={"since": second}).json()
+    assert (delta["changed"], delta["removed"]) == ({}, ["ETH-USD"])
+    # Deltas accumulate from any earlier version
+    delta = client.get("/ticker/delta", params={"since": first["version"]}).json()
+    assert set(delta["changed"]) == {"BTC-USD", "SOL-USD"} and delta["removed"] == ["ETH-USD"]
+
+
+def test_unknown_version_gets_full_snapshot_and_failed_refresh_serves_previous(monkeypatch, tmp_path):
+    upstream = [{"BTC-USD": _stats("100")}]
+    _setup(monkeypatch, tmp_path, upstream)
+
+    delta = client.get("/ticker/delta", params={"since": "otherepoch-3"}).json()
+    assert delta["full"] is True and delta["markets"] == {"BTC-USD": _stats("100")}
+
+    # The upstream list is exhausted, the refresh fails
+    res = client.get("/ticker")
+    assert res.status_code == 200 and res.json()["version"] == delta["version"]